@@ -1,26 +1,92 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, make_url, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from .config import settings
 
+
+def _pool_sizes() -> tuple[int, int]:
+    """
+    Chia DB_MAX_CONNECTIONS đều cho các API process.
+    Mỗi process giữ ~1/3 budget làm pool thường trực, phần còn lại là overflow.
+    """
+    budget = max(3, settings.DB_MAX_CONNECTIONS // settings.web_workers)
+    pool_size = settings.DB_POOL_SIZE or max(1, budget // 3)
+    max_overflow = settings.DB_MAX_OVERFLOW
+    if max_overflow is None:
+        max_overflow = max(0, budget - pool_size)
+    return pool_size, max_overflow
+
+
+def _async_url():
+    """postgresql://... → postgresql+asyncpg://... (kèm size của prepared statement cache)."""
+    url = make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg")
+    return url.update_query_dict(
+        {"prepared_statement_cache_size": str(settings.DB_PREPARED_STATEMENT_CACHE_SIZE)}
+    )
+
+
 # ── Engine + Session ──
+POOL_SIZE, MAX_OVERFLOW = _pool_sizes()
+
+# Sync engine (psycopg2): worker, scripts, init_db.
+# Không đặt statement_timeout: rebuild_rollups / CREATE INDEX trên bảng lớn chạy lâu hơn nhiều.
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine (asyncpg): API routes, không block event loop khi chờ DB.
+# statement_timeout chỉ áp dụng ở đây để 1 query chậm không giữ request mãi.
+async_engine = create_async_engine(
+    _async_url(),
+    pool_pre_ping=True,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    connect_args={
+        "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)},
+    },
+)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False, class_=AsyncSession
+)
+
 # ── Base class cho ORM models ──
 Base = declarative_base()
 
 
 # ── Dependency Injection ──
-def get_db():
-    """FastAPI dependency: mở DB session, tự đóng sau khi request xong."""
-    db = SessionLocal()
-    try:
+async def get_db():
+    """FastAPI dependency: mở AsyncSession, tự đóng sau khi request xong."""
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+# ── Schema ──
+# Cột thêm sau khi bảng đã tồn tại (create_all không ALTER bảng cũ)
+_ADDITIVE_MIGRATIONS = [
+    "ALTER TABLE detection_records ADD COLUMN IF NOT EXISTS source VARCHAR(100)",
+    "CREATE INDEX IF NOT EXISTS ix_detection_records_source ON detection_records (source)",
+    "ALTER TABLE detection_records ADD COLUMN IF NOT EXISTS inference_skipped BOOLEAN NOT NULL DEFAULT false",
+    "ALTER TABLE detection_rollups ADD COLUMN IF NOT EXISTS skipped INTEGER NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_rollup_source_bucket ON detection_rollups (source, bucket_start)",
+]
+
+
+def init_db():
+    """
+    Tạo/cập nhật schema. Chạy 1 lần trước khi start API/worker
+    (python -m scripts.init_db), không chạy trong boot của mỗi process.
+    """
+    from . import models  # noqa: F401 — đăng ký tables vào Base.metadata
+
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        for statement in _ADDITIVE_MIGRATIONS:
+            conn.execute(text(statement))
@@ -1,14 +1,78 @@
+import threading
 import cv2
 import numpy as np
 # import onnxruntime as ort
-import tritonclient.grpc as grpcclient
 from .config import settings
 from .schemas import BBoxInfo
+from .roi import bounding_rect, points_in_polygon, to_pixels
+
+_grpcclient = None
+
+
+def _grpc():
+    """Import tritonclient.grpc lazily — import nặng (grpc + protobuf), chỉ trả khi cần."""
+    global _grpcclient
+    if _grpcclient is None:
+        import tritonclient.grpc as grpcclient
+        _grpcclient = grpcclient
+    return _grpcclient
+
+
+# COCO class names theo thứ tự class_id của YOLO
+COCO_CLASSES = (
+    "person", "bicycle", "car", "motorcycle", "airplane", "bus", "train", "truck",
+    "boat", "traffic light", "fire hydrant", "stop sign", "parking meter", "bench",
+    "bird", "cat", "dog", "horse", "sheep", "cow", "elephant", "bear", "zebra",
+    "giraffe", "backpack", "umbrella", "handbag", "tie", "suitcase", "frisbee",
+    "skis", "snowboard", "sports ball", "kite", "baseball bat", "baseball glove",
+    "skateboard", "surfboard", "tennis racket", "bottle", "wine glass", "cup",
+    "fork", "knife", "spoon", "bowl", "banana", "apple", "sandwich", "orange",
+    "broccoli", "carrot", "hot dog", "pizza", "donut", "cake", "chair", "couch",
+    "potted plant", "bed", "dining table", "toilet", "tv", "laptop", "mouse",
+    "remote", "keyboard", "cell phone", "microwave", "oven", "toaster", "sink",
+    "refrigerator", "book", "clock", "vase", "scissors", "teddy bear",
+    "hair drier", "toothbrush",
+)
+
+
+def model_variants() -> dict[str, str]:
+    """Variant name (client chọn) → Triton model name. "default" = TRITON_MODEL_NAME."""
+    return {"default": settings.TRITON_MODEL_NAME, **settings.MODEL_VARIANTS}
+
+
+def resolve_model(variant: str | None) -> str:
+    """Variant → Triton model name. Raise ValueError nếu variant không tồn tại."""
+    variants = model_variants()
+    name = variant or settings.DEFAULT_MODEL_VARIANT
+    if name not in variants:
+        raise ValueError(f"Unknown model '{name}', available: {sorted(variants)}")
+    return variants[name]
+
+
+def parse_classes(classes: str | list | None) -> tuple[int, ...] | None:
+    """
+    "person,car" / "0,2" / ["person", 2] → (0, 2).
+    Raise ValueError nếu có class không hợp lệ.
+    """
+    if classes is None or classes == "":
+        return None
+    items = classes.split(",") if isinstance(classes, str) else classes
+    ids = []
+    for item in items:
+        item = str(item).strip().lower()
+        if item.isdigit() and int(item) < len(COCO_CLASSES):
+            ids.append(int(item))
+        elif item in COCO_CLASSES:
+            ids.append(COCO_CLASSES.index(item))
+        else:
+            raise ValueError(f"Unknown class '{item}'")
+    return tuple(sorted(set(ids)))
 
 
 class PersonDetector:
     """
-    YOLO26 person detector using ONNX Runtime.
+    YOLO26 detector qua Triton (mặc định đếm person).
+    Model / ngưỡng / class có thể chọn theo từng request.
 
     Output format: [1, 300, 6] — (x1, y1, x2, y2, confidence, class_id)
     Already NMS'd by the model, no need for manual NMS.
@@ -23,8 +87,8 @@ class PersonDetector:
         # self.session: ort.InferenceSession | None = None
         # self._load_model()
         self.conf = conf or settings.CONFIDENCE_THRESHOLD
-        self.model_name = settings.TRITON_MODEL_NAME
-        self.client = grpcclient.InferenceServerClient(url=settings.TRITON_URL)
+        self.model_name = resolve_model(None)
+        self.client = _grpc().InferenceServerClient(url=settings.TRITON_URL)
 
     # def _load_model(self):
     #     """Load ONNX model."""
@@ -63,7 +127,14 @@ class PersonDetector:
         return blob, ratio, (pad_w, pad_h)
 
     def _postprocess(
-        self, output: np.ndarray, ratio: float, pad: tuple[int, int]
+        self,
+        output: np.ndarray,
+        ratio: float,
+        pad: tuple[int, int],
+        conf: float | None = None,
+        classes: tuple[int, ...] | None = None,
+        offset: tuple[int, int] = (0, 0),
+        polygon: np.ndarray | None = None,
     ) -> list[BBoxInfo]:
         """
         Xử lý YOLO26 output → danh sách BBoxInfo.
@@ -71,51 +142,132 @@ class PersonDetector:
         YOLO26 output: [1, 300, 6]
         Mỗi detection: [x1, y1, x2, y2, confidence, class_id]
         Đã qua NMS trong model, không cần NMS thủ công.
+        offset: góc trên-trái của vùng crop (ROI) trong ảnh gốc.
+        polygon: ROI (pixel, ảnh gốc) — chỉ giữ box có điểm chân nằm trong.
         """
         detections = output[0]  # [300, 6]
         pad_w, pad_h = pad
+        off_x, off_y = offset
+        conf = self.conf if conf is None else conf
+        classes = classes or (self.PERSON_CLASS_ID,)
 
-        results = []
-        for det in detections:
-            x1, y1, x2, y2, conf, class_id = det
+        # Lọc class + ngưỡng confidence (mặc định chỉ person)
+        keep = (detections[:, 4] >= conf) & np.isin(detections[:, 5].astype(np.int64), classes)
+        detections = detections[keep]
 
-            # Chỉ lấy person (class 0) và trên ngưỡng confidence
-            if int(class_id) != self.PERSON_CLASS_ID:
-                continue
-            if conf < self.conf:
-                continue
+        # Scale back to original image coordinates
+        xyxy = detections[:, :4].copy()
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad_w) / ratio + off_x
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad_h) / ratio + off_y
 
-            # Scale back to original image coordinates
-            x1 = (x1 - pad_w) / ratio
-            y1 = (y1 - pad_h) / ratio
-            x2 = (x2 - pad_w) / ratio
-            y2 = (y2 - pad_h) / ratio
+        if polygon is not None:
+            # Điểm chân (bottom-center) của box phải nằm trong ROI
+            feet = np.stack([(xyxy[:, 0] + xyxy[:, 2]) / 2, xyxy[:, 3]], axis=1)
+            inside = points_in_polygon(feet, polygon)
+            xyxy, detections = xyxy[inside], detections[inside]
 
-            results.append(BBoxInfo(
+        return [
+            BBoxInfo(
                 x1=int(x1),
                 y1=int(y1),
                 x2=int(x2),
                 y2=int(y2),
-                conf=round(float(conf), 4),
-            ))
+                conf=round(float(det[4]), 4),
+                label=COCO_CLASSES[int(det[5])],
+            )
+            for (x1, y1, x2, y2), det in zip(xyxy, detections)
+        ]
 
-        return results
+    def detect(
+        self,
+        image: np.ndarray,
+        model: str | None = None,
+        conf: float | None = None,
+        classes: tuple[int, ...] | None = None,
+        roi: np.ndarray | None = None,
+    ) -> list[BBoxInfo]:
+        """
+        Detect object trong ảnh, trả về danh sách BBoxInfo.
+        model: Triton model name (xem resolve_model), mặc định model của detector.
+        conf / classes: ghi đè ngưỡng và class cần đếm (mặc định person).
+        roi: polygon chuẩn hoá 0–1 — crop theo hình chữ nhật bao ROI trước khi
+        letterbox (nhiều pixel hơn cho vùng cần đếm), rồi lọc box theo polygon.
+        """
+        offset, polygon = (0, 0), None
+        if roi is not None:
+            polygon = to_pixels(roi, image.shape)
+            x0, y0, x1, y1 = bounding_rect(polygon, image.shape)
+            if x1 > x0 and y1 > y0:
+                image = image[y0:y1, x0:x1]
+                offset = (x0, y0)
 
-    def detect(self, image: np.ndarray) -> list[BBoxInfo]:
-        """Detect người trong ảnh, trả về danh sách BBoxInfo."""
         blob, ratio, pad = self._preprocess(image)
         # outputs = self.session.run(None, {self.input_name: blob})
+        output = self._infer(blob, model)
+
+        return self._postprocess(output, ratio, pad, conf, classes, offset, polygon)
+
+    def _infer(self, blob: np.ndarray, model: str | None = None) -> np.ndarray:
+        grpcclient = _grpc()
         input_tensor = grpcclient.InferInput("images", blob.shape, "FP32")
         input_tensor.set_data_from_numpy(blob)
 
         result = self.client.infer(
-            model_name=self.model_name,
+            model_name=model or self.model_name,
             inputs=[input_tensor]
         )
 
-        output = result.as_numpy("output0")
+        return result.as_numpy("output0")
+
+    def _batch_sizes(self, model: str, batch_sizes: list[int]) -> list[int]:
+        """Lọc batch size theo max_batch_size trong config của model (0 = shape cố định, chỉ 1)."""
+        limit = self.client.get_model_config(model).config.max_batch_size or 1
+        return [b for b in batch_sizes if 1 <= b <= limit] or [1]
+
+    def _warm_model(self, model: str, batch_sizes: list[int], runs: int):
+        for batch_size in self._batch_sizes(model, batch_sizes):
+            blob = np.zeros((batch_size, 3, self.INPUT_SIZE, self.INPUT_SIZE), dtype=np.float32)
+            for _ in range(runs):
+                self._infer(blob, model)
+
+    def warmup(self, batch_sizes: list[int], runs: int = 1) -> list[str]:
+        """
+        Gửi inference giả (ảnh xám) cho từng batch size hợp lệ để Triton/ONNX Runtime
+        cấp phát session, memory arena trước khi có request thật.
+
+        Chỉ model mặc định bắt buộc (raise nếu lỗi); các variant khác warm-up
+        best-effort. Trả về lỗi của các variant đó.
+        """
+        # Chạy cả pre/postprocess 1 lần để numpy/cv2 khởi tạo xong
+        self.detect(np.full((self.INPUT_SIZE, self.INPUT_SIZE, 3), 114, dtype=np.uint8))
+        self._warm_model(self.model_name, batch_sizes, runs)
 
-        return self._postprocess(output, ratio, pad)
+        errors = []
+        for model in dict.fromkeys(model_variants().values()):
+            if model == self.model_name:
+                continue
+            try:
+                self._warm_model(model, batch_sizes, runs)
+            except Exception as e:
+                errors.append(f"{model}: {e}")
+        return errors
 
     def is_loaded(self) -> bool:
         return self.client.is_model_ready(self.model_name)
+
+
+_detector: PersonDetector | None = None
+_detector_lock = threading.Lock()
+
+
+def get_detector() -> PersonDetector:
+    """
+    Detector dùng chung trong process, tạo lần đầu khi cần (không tạo lúc import)
+    nên gRPC channel luôn được mở sau khi gunicorn fork worker.
+    """
+    global _detector
+    if _detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = PersonDetector()
+    return _detector
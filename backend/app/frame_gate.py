@@ -0,0 +1,103 @@
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from .config import settings
+from .detector import PersonDetector
+from .roi import bounding_rect, to_pixels
+from .schemas import BBoxInfo
+
+SIGNATURE_SIZE = 64
+
+
+def frame_signature(image: np.ndarray, roi: np.ndarray | None = None) -> np.ndarray:
+    """
+    Ảnh xám 64x64 (INTER_AREA) của khung hình — hoặc chỉ vùng bao ROI,
+    vì thay đổi ngoài ROI không ảnh hưởng kết quả đếm.
+    """
+    if roi is not None:
+        x0, y0, x1, y1 = bounding_rect(to_pixels(roi, image.shape), image.shape)
+        if x1 > x0 and y1 > y0:
+            image = image[y0:y1, x0:x1]
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (SIGNATURE_SIZE, SIGNATURE_SIZE), interpolation=cv2.INTER_AREA)
+
+
+def frame_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """
+    Tỷ lệ pixel của signature đổi hơn FRAME_SKIP_PIXEL_DELTA (0–1).
+    Không dùng mean abs diff toàn khung: 1 người nhỏ bước vào chỉ làm
+    trung bình đổi rất ít, nhưng vẫn làm vài ô đổi mạnh.
+    """
+    changed = cv2.absdiff(a, b) > settings.FRAME_SKIP_PIXEL_DELTA
+    return float(np.count_nonzero(changed)) / changed.size
+
+
+class FrameGate:
+    """
+    Bỏ qua inference khi frame gần như không đổi so với frame gần nhất
+    đã chạy inference của cùng source (và cùng model/conf/classes).
+
+    State nằm trong process (LRU theo source); so sánh luôn với frame đã
+    inference chứ không phải frame vừa skip, để thay đổi chậm không bị bỏ sót.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[tuple, tuple[float, np.ndarray, list[BBoxInfo]]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key: tuple, signature: np.ndarray) -> list[BBoxInfo] | None:
+        """Trả về boxes cũ nếu frame đủ giống và chưa quá FRAME_SKIP_MAX_AGE_SECONDS."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+        stored_at, ref_signature, boxes = entry
+        if time.monotonic() - stored_at > settings.FRAME_SKIP_MAX_AGE_SECONDS:
+            return None
+        if frame_difference(signature, ref_signature) > settings.FRAME_SKIP_THRESHOLD:
+            return None
+        return boxes
+
+    def store(self, key: tuple, signature: np.ndarray, boxes: list[BBoxInfo]):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), signature, boxes)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+frame_gate = FrameGate()
+
+
+def detect_with_gate(
+    detector: PersonDetector,
+    image: np.ndarray,
+    source: str | None,
+    model: str | None = None,
+    conf: float | None = None,
+    classes: tuple[int, ...] | None = None,
+    roi: np.ndarray | None = None,
+) -> tuple[list[BBoxInfo], bool]:
+    """
+    detector.detect có gate thay đổi khung hình (chỉ áp dụng khi có source
+    và FRAME_SKIP_ENABLED). Trả về (boxes, skipped).
+    """
+    if not (settings.FRAME_SKIP_ENABLED and source):
+        return detector.detect(image, model, conf, classes, roi), False
+
+    # ROI đổi thì kết quả cũ không còn dùng được
+    key = (source, model, conf, classes, roi.tobytes() if roi is not None else None)
+    signature = frame_signature(image, roi)
+    boxes = frame_gate.lookup(key, signature)
+    if boxes is not None:
+        return boxes, True
+
+    boxes = detector.detect(image, model, conf, classes, roi)
+    frame_gate.store(key, signature, boxes)
+    return boxes, False
@@ -11,27 +11,40 @@ class KafkaProducer:
     """Async Kafka producer cho detection pipeline."""
 
     def __init__(self):
+        # Tạo trong start(): AIOKafkaProducer cần event loop đang chạy, còn
+        # gunicorn worker import app trước khi loop start
+        self.producer: AIOKafkaProducer | None = None
+
+    async def start(self):
         self.producer = AIOKafkaProducer(
             bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
             value_serializer=lambda v: json.dumps(v).encode("utf-8"),
         )
-
-    async def start(self):
         await self.producer.start()
 
     async def stop(self):
-        await self.producer.stop()
+        if self.producer is not None:
+            await self.producer.stop()
+            self.producer = None
 
     async def send_detection_request(
-        self, task_id: str, image_path: str, original_filename: str
+        self, task_id: str, image_path: str, original_filename: str,
+        source: str | None = None,
+        options: dict | None = None,
     ):
+        options = options or {}
         message = {
             "task_id": task_id,
             "image_path": image_path,
             "original_filename": original_filename,
+            "source": source,
+            "options": options,
             "timestamp": datetime.utcnow().isoformat(),
         }
-        await self.producer.send_and_wait(TOPIC, message)
+        # Key theo source → frame cùng camera vào cùng worker (frame gate theo process
+        # dùng được); không có source thì không key để chia đều các partition
+        key = source.encode("utf-8") if source else None
+        await self.producer.send_and_wait(TOPIC, message, key=key)
 
 
 # Singleton instance — start/stop trong main.py lifespan
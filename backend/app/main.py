@@ -1,28 +1,49 @@
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from .config import settings
-from .database import engine, Base
-from .routes import detection, history
+from .database import async_engine, engine, init_db
+from .routes import detection, history, analytics, images, sources
 from .kafka_producer import kafka_producer
+from .processing import start_pool, stop_pool
+from .uploads import UploadLimitMiddleware
+from .startup import readiness, warm_up_detector
+
+
+def _prepare_dirs():
+    settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    (settings.UPLOAD_DIR / "uploads").mkdir(parents=True, exist_ok=True)
+    settings.THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    Base.metadata.create_all(bind=engine)
-    settings.UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
-    (settings.UPLOAD_DIR / "uploads").mkdir(parents=True, exist_ok=True)
+    # Schema do `python -m scripts.init_db` lo; cờ này chỉ dành cho dev
+    if settings.DB_INIT_ON_STARTUP:
+        await asyncio.to_thread(init_db)
+
+    # Mỗi worker process có producer + decode pool riêng, khởi tạo song song
+    await asyncio.gather(
+        kafka_producer.start(),
+        asyncio.to_thread(start_pool),
+        asyncio.to_thread(_prepare_dirs),
+    )
 
-    # Start Kafka producer
-    await kafka_producer.start()
+    # Warm-up Triton chạy nền; /health/ready trả 503 cho tới khi xong
+    warmup_task = asyncio.create_task(warm_up_detector())
 
     yield
 
     # Shutdown
+    warmup_task.cancel()
+    stop_pool()
     await kafka_producer.stop()
+    await async_engine.dispose()
     engine.dispose()
 
 app = FastAPI(
@@ -32,6 +53,9 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Reject upload quá lớn theo Content-Length (add trước CORS để response 413 vẫn có CORS headers)
+app.add_middleware(UploadLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -41,13 +65,26 @@ app.add_middleware(
 )
 
 # ── Static Files ──
+# Giữ cho URL cũ /static/results/...; URL mới đi qua /images (cache headers, thumbnails, range)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # ── Routes ──
 app.include_router(detection.router, prefix="/api", tags=["Detection"])
 app.include_router(history.router, prefix="/api", tags=["History"])
+app.include_router(analytics.router, prefix="/api", tags=["Analytics"])
+app.include_router(sources.router, prefix="/api", tags=["Sources"])
+app.include_router(images.router, tags=["Images"])
 
 
 @app.get("/health")
+@app.get("/health/live")
 async def health():
-    return {"status": "ok"}
\ No newline at end of file
+    """Liveness: process còn chạy và event loop còn phản hồi."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: đã warm-up model, DB và Triton sẵn sàng nhận request."""
+    ready, body = await readiness()
+    return JSONResponse(body, status_code=200 if ready else 503)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Boolean, Column, Index, Integer, String, DateTime, JSON, UniqueConstraint
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -14,6 +14,11 @@ class DetectionRecord(Base):
     result_image_path = Column(String(500), nullable=False)
     original_filename = Column(String(255), nullable=False)
 
+    # Nguồn ảnh (camera id, ...), nullable vì records cũ không có
+    source = Column(String(100), nullable=True, index=True)
+    # True = frame gần như không đổi, dùng lại kết quả trước, không gọi Triton
+    inference_skipped = Column(Boolean, nullable=False, default=False, server_default="false")
+
     # Link tới Task (nullable vì records cũ không có)
     task_id = Column(String(36), nullable=True)
 
@@ -39,4 +44,44 @@ class Task(Base):
     error_message = Column(String(1000), nullable=True)
 
     def __repr__(self):
-        return f"<Task id={self.id} status={self.status}>"
\ No newline at end of file
+        return f"<Task id={self.id} status={self.status}>"
+
+
+class DetectionRollup(Base):
+    """
+    Rollup theo giờ cho analytics, worker/API cập nhật mỗi lần insert DetectionRecord.
+    Mỗi row = số frame có đúng `num_detections` người trong 1 giờ của 1 source,
+    nên sum/avg/max và percentile đều tính chính xác từ bảng này.
+    """
+    __tablename__ = "detection_rollups"
+    __table_args__ = (
+        UniqueConstraint("bucket_start", "source", "num_detections", name="uq_rollup_bucket"),
+        # Filter theo source + khoảng thời gian
+        Index("ix_rollup_source_bucket", "source", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    bucket_start = Column(DateTime(timezone=True), nullable=False, index=True)
+    source = Column(String(100), nullable=False, default="")  # "" = không có source
+    num_detections = Column(Integer, nullable=False)
+    frequency = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0, server_default="0")  # số frame bỏ qua inference
+
+    def __repr__(self):
+        return (
+            f"<DetectionRollup {self.bucket_start} source={self.source!r} "
+            f"n={self.num_detections} x{self.frequency}>"
+        )
+
+
+
+class CameraSource(Base):
+    """Cấu hình theo source (camera). roi = polygon [[x, y], ...] toạ độ chuẩn hoá 0–1."""
+    __tablename__ = "sources"
+
+    id = Column(String(100), primary_key=True)
+    roi = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<CameraSource id={self.id!r}>"
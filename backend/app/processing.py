@@ -0,0 +1,74 @@
+import asyncio
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .roi import to_pixels
+from .schemas import BBoxInfo
+from .storage import save_result
+from .visualizer import draw_boxes
+
+
+# ── CPU-bound stages (chạy được trong process pool, phải picklable) ──
+
+def decode_image(image_bytes: bytes) -> np.ndarray | None:
+    """Decode bytes → BGR image. Trả về None nếu không đọc được."""
+    image_np = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(image_np, cv2.IMREAD_COLOR)
+
+
+def render_result(
+    image: np.ndarray, boxes: list[BBoxInfo], roi: np.ndarray | None = None
+) -> str:
+    """Vẽ boxes (+ ROI chuẩn hoá nếu có) + lưu ảnh kết quả. Trả về result_path."""
+    polygon = to_pixels(roi, image.shape) if roi is not None else None
+    annotated = draw_boxes(image, boxes, polygon)
+    return save_result(annotated, prefix="result")
+
+
+# ── Process pool ──
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def _noop() -> None:
+    return None
+
+
+def start_pool() -> None:
+    """
+    Khởi tạo process pool (nếu DECODE_WORKERS > 0) và prefork toàn bộ process
+    ngay lúc startup để request đầu không phải chờ spawn.
+    Dùng "spawn" vì process cha đã có gRPC/Kafka threads, fork không an toàn.
+    """
+    global _executor
+    if settings.DECODE_WORKERS <= 0 or _executor is not None:
+        return
+    _executor = ProcessPoolExecutor(
+        max_workers=settings.DECODE_WORKERS,
+        mp_context=mp.get_context("spawn"),
+    )
+    for future in [_executor.submit(_noop) for _ in range(settings.DECODE_WORKERS)]:
+        future.result()
+
+
+def stop_pool() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def run_cpu(func, *args):
+    """
+    Chạy 1 stage CPU-bound ngoài event loop: trong process pool nếu có,
+    ngược lại trong threadpool (cv2 nhả GIL nên vẫn tận dụng được nhiều core).
+    """
+    if _executor is None:
+        return await run_in_threadpool(func, *args)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, func, *args)
@@ -0,0 +1,86 @@
+import math
+import time
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import CameraSource
+
+# source → (thời điểm load, polygon chuẩn hoá | None)
+_cache: dict[str, tuple[float, np.ndarray | None]] = {}
+
+
+def to_pixels(roi: np.ndarray, shape: tuple[int, ...]) -> np.ndarray:
+    """Polygon chuẩn hoá 0–1 → toạ độ pixel theo kích thước ảnh."""
+    h, w = shape[:2]
+    return roi * np.array([w, h], dtype=np.float32)
+
+
+def bounding_rect(polygon: np.ndarray, shape: tuple[int, ...]) -> tuple[int, int, int, int]:
+    """Hình chữ nhật bao polygon (pixel), clamp trong ảnh. Trả về (x0, y0, x1, y1)."""
+    h, w = shape[:2]
+    x0 = max(0, math.floor(polygon[:, 0].min()))
+    y0 = max(0, math.floor(polygon[:, 1].min()))
+    x1 = min(w, math.ceil(polygon[:, 0].max()))
+    y1 = min(h, math.ceil(polygon[:, 1].max()))
+    return x0, y0, x1, y1
+
+
+def points_in_polygon(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """
+    Ray casting vectorized: points [N, 2], polygon [M, 2] → mask bool [N].
+    Đếm số cạnh polygon mà tia ngang từ mỗi điểm cắt qua (lẻ = bên trong).
+    """
+    if len(points) == 0:
+        return np.zeros(0, dtype=bool)
+    x = points[:, 0:1]
+    y = points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+
+    crosses = (y1 > y) != (y2 > y)  # [N, M]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_cross = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(crosses & (x < x_cross), axis=1) % 2 == 1
+
+
+def _cached(source: str) -> tuple[bool, np.ndarray | None]:
+    hit = _cache.get(source)
+    if hit and time.monotonic() - hit[0] < settings.ROI_CACHE_SECONDS:
+        return True, hit[1]
+    return False, None
+
+
+def _store(source: str, row: CameraSource | None) -> np.ndarray | None:
+    roi = np.asarray(row.roi, dtype=np.float32) if row and row.roi else None
+    _cache[source] = (time.monotonic(), roi)
+    return roi
+
+
+def get_roi(db: Session, source: str | None) -> np.ndarray | None:
+    """
+    ROI (chuẩn hoá) của source, cache trong process ROI_CACHE_SECONDS
+    để không query DB cho mỗi frame.
+    """
+    if not source:
+        return None
+    hit, roi = _cached(source)
+    if hit:
+        return roi
+    return _store(source, db.get(CameraSource, source))
+
+
+async def aget_roi(db: AsyncSession, source: str | None) -> np.ndarray | None:
+    """Như get_roi nhưng qua AsyncSession (API routes), dùng chung cache."""
+    if not source:
+        return None
+    hit, roi = _cached(source)
+    if hit:
+        return roi
+    return _store(source, await db.get(CameraSource, source))
+
+
+def invalidate(source: str):
+    _cache.pop(source, None)
@@ -0,0 +1,84 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import func, literal, select, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from .models import DetectionRecord, DetectionRollup
+
+
+def bucket_of(ts: datetime) -> datetime:
+    """Làm tròn timestamp xuống đầu giờ (UTC)."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def rollup_upsert(
+    num_detections: int,
+    source: str | None = None,
+    created_at: datetime | None = None,
+    skipped: bool = False,
+):
+    """
+    Câu upsert tăng frequency (và skipped nếu frame bỏ qua inference)
+    của bucket tương ứng. Dùng chung cho Session (worker) và AsyncSession (API).
+    """
+    bucket = bucket_of(created_at or datetime.now(timezone.utc))
+    stmt = insert(DetectionRollup).values(
+        bucket_start=bucket,
+        source=source or "",
+        num_detections=num_detections,
+        frequency=1,
+        skipped=int(skipped),
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_rollup_bucket",
+        set_={
+            "frequency": DetectionRollup.frequency + 1,
+            "skipped": DetectionRollup.skipped + int(skipped),
+        },
+    )
+    return stmt
+
+
+def update_rollup(
+    db: Session,
+    num_detections: int,
+    source: str | None = None,
+    created_at: datetime | None = None,
+    skipped: bool = False,
+):
+    """
+    Upsert rollup qua Session sync.
+    Gọi cùng transaction với insert DetectionRecord, commit do caller lo.
+    """
+    db.execute(rollup_upsert(num_detections, source, created_at, skipped))
+
+
+def rebuild_rollups(db: Session) -> int:
+    """
+    Tính lại toàn bộ rollup từ detection_records (dùng cho data cũ hoặc khi lệch).
+    Trả về số rows rollup đã tạo.
+    """
+    bucket = func.date_trunc("hour", func.timezone("UTC", DetectionRecord.created_at))
+    source = func.coalesce(DetectionRecord.source, literal(""))
+    rows = (
+        select(
+            func.timezone("UTC", bucket),
+            source,
+            DetectionRecord.num_detections,
+            func.count(),
+            func.count().filter(DetectionRecord.inference_skipped),
+        )
+        .group_by(bucket, source, DetectionRecord.num_detections)
+    )
+
+    db.execute(text(f"TRUNCATE {DetectionRollup.__tablename__}"))
+    result = db.execute(
+        insert(DetectionRollup).from_select(
+            ["bucket_start", "source", "num_detections", "frequency", "skipped"], rows
+        )
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,246 @@
+import math
+from datetime import date, datetime, time, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..models import DetectionRollup
+from ..schemas import (
+    CountBucket,
+    CountSeriesResponse,
+    FrameSkipResponse,
+    FrameSkipStats,
+    PercentileResponse,
+)
+
+router = APIRouter()
+
+INTERVAL_PATTERN = "^(hour|day)$"
+METRIC_PATTERN = "^(total|avg|max)$"
+
+# Không truyền date_from/date_to thì chỉ query khoảng gần nhất, để thời gian
+# response không tăng theo lịch sử; khoảng tối đa giới hạn số bucket trả về.
+DEFAULT_WINDOW_DAYS = {"hour": 7, "day": 90}
+MAX_WINDOW_DAYS = {"hour": 31, "day": 366}
+# Giới hạn cứng số bucket của /analytics/counts (by_source nhân theo số source)
+MAX_BUCKETS = 10_000
+
+
+def _bucket_expr(interval: str):
+    """Bucket theo giờ lấy thẳng từ rollup; theo ngày thì gộp 24 bucket giờ (UTC)."""
+    if interval == "hour":
+        return DetectionRollup.bucket_start
+    return func.timezone(
+        "UTC", func.date_trunc("day", func.timezone("UTC", DetectionRollup.bucket_start))
+    )
+
+
+def _window(interval: str, date_from: date | None, date_to: date | None) -> tuple[date, date]:
+    """
+    Khoảng ngày (UTC) sẽ query: date_to mặc định hôm nay, date_from mặc định
+    DEFAULT_WINDOW_DAYS trước date_to. Raise 400 nếu vượt MAX_WINDOW_DAYS.
+    """
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=DEFAULT_WINDOW_DAYS[interval] - 1)
+    if date_from > date_to:
+        raise HTTPException(400, "date_from must not be after date_to")
+    if (date_to - date_from).days + 1 > MAX_WINDOW_DAYS[interval]:
+        raise HTTPException(
+            400, f"Range too large for interval={interval} (max {MAX_WINDOW_DAYS[interval]} days)"
+        )
+    return date_from, date_to
+
+
+def _filter(query, date_from: date, date_to: date, source: str | None):
+    start = datetime.combine(date_from, time.min, tzinfo=timezone.utc)
+    end = datetime.combine(date_to, time.max, tzinfo=timezone.utc)
+    query = query.where(DetectionRollup.bucket_start.between(start, end))
+    if source is not None:
+        query = query.where(DetectionRollup.source == source)
+    return query
+
+
+def _aggregate(interval: str, by_source: bool):
+    """SELECT bucket[, source], frames, total, max, skipped FROM rollups GROUP BY ..."""
+    bucket = _bucket_expr(interval).label("bucket")
+    frames = func.sum(DetectionRollup.frequency).label("frames")
+    total = func.sum(DetectionRollup.num_detections * DetectionRollup.frequency).label("total")
+    columns = [
+        bucket,
+        frames,
+        total,
+        func.max(DetectionRollup.num_detections).label("max"),
+        func.sum(DetectionRollup.skipped).label("skipped"),
+    ]
+    group_by = [bucket]
+    if by_source:
+        columns.insert(1, DetectionRollup.source)
+        group_by.append(DetectionRollup.source)
+    return select(*columns).group_by(*group_by), bucket, frames, total
+
+
+def _ratio(part: int, whole: int) -> float:
+    return round(part / whole, 4) if whole else 0.0
+
+
+def _to_bucket(row, by_source: bool) -> CountBucket:
+    return CountBucket(
+        bucket=row.bucket,
+        source=(row.source or None) if by_source else None,
+        frames=row.frames,
+        total=row.total,
+        avg=round(row.total / row.frames, 3) if row.frames else 0.0,
+        max=row.max,
+        skipped=row.skipped,
+        bypass_ratio=_ratio(row.skipped, row.frames),
+    )
+
+
+@router.get("/analytics/counts", response_model=CountSeriesResponse)
+async def get_counts(
+    interval: str = Query("hour", pattern=INTERVAL_PATTERN),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    source: str | None = Query(None),
+    by_source: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Chuỗi thời gian số người theo giờ/ngày (frames, tổng, trung bình, max).
+    Đọc từ bảng rollup nên không phụ thuộc số rows detection_records.
+    Mặc định 7 ngày gần nhất (hour) / 90 ngày (day).
+    """
+    date_from, date_to = _window(interval, date_from, date_to)
+    query, bucket, _, _ = _aggregate(interval, by_source)
+    rows = (
+        await db.execute(
+            _filter(query, date_from, date_to, source)
+            .order_by(bucket)
+            .limit(MAX_BUCKETS + 1)
+        )
+    ).all()
+    return CountSeriesResponse(
+        interval=interval,
+        date_from=date_from,
+        date_to=date_to,
+        items=[_to_bucket(r, by_source) for r in rows[:MAX_BUCKETS]],
+        truncated=len(rows) > MAX_BUCKETS,
+    )
+
+
+@router.get("/analytics/top", response_model=CountSeriesResponse)
+async def get_top_periods(
+    interval: str = Query("hour", pattern=INTERVAL_PATTERN),
+    metric: str = Query("total", pattern=METRIC_PATTERN),
+    limit: int = Query(10, ge=1, le=100),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    source: str | None = Query(None),
+    by_source: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+):
+    """Top-N khoảng thời gian đông người nhất theo total / avg / max."""
+    date_from, date_to = _window(interval, date_from, date_to)
+    query, _, frames, total = _aggregate(interval, by_source)
+    order = {
+        "total": total,
+        "avg": total * 1.0 / frames,
+        "max": func.max(DetectionRollup.num_detections),
+    }[metric]
+    rows = (
+        await db.execute(
+            _filter(query, date_from, date_to, source)
+            .order_by(desc(order))
+            .limit(limit)
+        )
+    ).all()
+    return CountSeriesResponse(
+        interval=interval,
+        date_from=date_from,
+        date_to=date_to,
+        items=[_to_bucket(r, by_source) for r in rows],
+    )
+
+
+@router.get("/analytics/percentiles", response_model=PercentileResponse)
+async def get_percentiles(
+    q: list[float] = Query([50, 90, 99]),
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    source: str | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Percentile (nearest-rank) của số người / ảnh.
+    Rollup lưu histogram theo num_detections nên kết quả là chính xác.
+    Mặc định 90 ngày gần nhất.
+    """
+    date_from, date_to = _window("day", date_from, date_to)
+    query = select(
+        DetectionRollup.num_detections,
+        func.sum(DetectionRollup.frequency).label("frequency"),
+    ).group_by(DetectionRollup.num_detections)
+    histogram = (
+        await db.execute(
+            _filter(query, date_from, date_to, source)
+            .order_by(DetectionRollup.num_detections)
+        )
+    ).all()
+
+    frames = sum(row.frequency for row in histogram)
+    percentiles: dict[str, int] = {}
+    for p in sorted(set(min(max(p, 0.0), 100.0) for p in q)):
+        if frames == 0:
+            break
+        rank = max(1, math.ceil(p / 100 * frames))
+        seen = 0
+        for row in histogram:
+            seen += row.frequency
+            if seen >= rank:
+                percentiles[f"p{p:g}"] = row.num_detections
+                break
+
+    return PercentileResponse(
+        date_from=date_from, date_to=date_to, frames=frames, percentiles=percentiles
+    )
+
+
+@router.get("/analytics/frame-skip", response_model=FrameSkipResponse)
+async def get_frame_skip(
+    date_from: date | None = Query(None),
+    date_to: date | None = Query(None),
+    source: str | None = Query(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Tỷ lệ frame được bỏ qua inference (frame không đổi) theo source (mặc định 90 ngày)."""
+    date_from, date_to = _window("day", date_from, date_to)
+    query = select(
+        DetectionRollup.source,
+        func.sum(DetectionRollup.frequency).label("frames"),
+        func.sum(DetectionRollup.skipped).label("skipped"),
+    ).group_by(DetectionRollup.source)
+    rows = (
+        await db.execute(
+            _filter(query, date_from, date_to, source).order_by(DetectionRollup.source)
+        )
+    ).all()
+
+    frames = sum(r.frames for r in rows)
+    skipped = sum(r.skipped for r in rows)
+    return FrameSkipResponse(
+        date_from=date_from,
+        date_to=date_to,
+        frames=frames,
+        skipped=skipped,
+        bypass_ratio=_ratio(skipped, frames),
+        sources=[
+            FrameSkipStats(
+                source=r.source or None,
+                frames=r.frames,
+                skipped=r.skipped,
+                bypass_ratio=_ratio(r.skipped, r.frames),
+            )
+            for r in rows
+        ],
+    )
@@ -1,18 +1,22 @@
 import uuid
-import cv2
-import numpy as np
-from pathlib import Path
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import bindparam, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
-from ..detector import PersonDetector
-from ..visualizer import draw_boxes, save_result
+from ..detector import PersonDetector, get_detector, parse_classes, resolve_model
+from ..processing import decode_image, render_result, run_cpu
+from ..uploads import EXTENSIONS, read_upload, save_upload
+from ..storage import result_url, thumbnail_url, save_bytes
+from ..rollups import rollup_upsert
+from ..roi import aget_roi
+from ..frame_gate import detect_with_gate
 from ..kafka_producer import kafka_producer
 from ..models import DetectionRecord, Task
 from ..schemas import (
     DetectionResponse,
-    BBoxInfo,
+    DetectionOptions,
     DetailedDetectionResponse,
     TaskSubmitResponse,
     TaskStatusResponse,
@@ -20,79 +24,112 @@ from ..schemas import (
 from ..config import settings
 
 router = APIRouter()
-detector = PersonDetector()
+
+# Query nóng (client poll liên tục): giữ 1 statement cố định để SQL text không đổi,
+# asyncpg prepare 1 lần mỗi connection rồi dùng lại từ prepared statement cache.
+TASK_BY_ID = select(Task).where(Task.id == bindparam("task_id"))
+
+
+def detection_options(
+    model: str | None = Form(None, description="Model variant (MODEL_VARIANTS)"),
+    conf: float | None = Form(None, ge=0, le=1),
+    classes: str | None = Form(None, description='Class names/ids, vd "person,car"'),
+) -> DetectionOptions:
+    """Form fields → DetectionOptions, validate model variant + class names."""
+    variant = model or settings.DEFAULT_MODEL_VARIANT
+    try:
+        resolve_model(variant)
+        class_ids = parse_classes(classes)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return DetectionOptions(
+        model=variant,
+        conf=conf,
+        classes=list(class_ids) if class_ids else None,
+    )
 
 
 @router.post("/detect", response_model=DetailedDetectionResponse)
 async def detect_person_sync(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    source: str | None = Form(None, max_length=100),
+    options: DetectionOptions = Depends(detection_options),
+    db: AsyncSession = Depends(get_db),
+    detector: PersonDetector = Depends(get_detector),
 ):
     """
     Synchronous detection — chờ kết quả rồi trả về.
     Giữ lại endpoint cũ cho backward compatibility.
     """
-    allowed_types = {"image/jpeg", "image/png", "image/webp"}
-    if file.content_type not in allowed_types:
-        raise HTTPException(400, "Only accepted JPEG, PNG, WebP")
-
-    image_bytes = await file.read()
-    image_np = np.frombuffer(image_bytes, np.uint8)
-    image = cv2.imdecode(image_np, cv2.IMREAD_COLOR)
+    # Đọc theo chunk, check magic bytes + kích thước từ header trước khi decode
+    image_bytes, content_type = await read_upload(file)
+    image = await run_cpu(decode_image, image_bytes)
 
     if image is None:
         raise HTTPException(400, "Cannot read image file")
 
-    boxes = detector.detect(image)
-    annotated = draw_boxes(image, boxes)
-
-    result_path = save_result(annotated, prefix="result")
-    original_path = save_result(image, prefix="original")
+    # ROI của source (nếu có): crop + chỉ đếm trong polygon
+    roi = await aget_roi(db, source)
+    # Cache miss mở transaction — trả connection về pool trước khi chờ Triton/render
+    await db.rollback()
+
+    # gRPC call blocking → chạy trong threadpool để không chặn event loop.
+    # Frame gần như không đổi so với lần trước của source → dùng lại kết quả.
+    boxes, skipped = await run_in_threadpool(
+        detect_with_gate,
+        detector,
+        image,
+        source,
+        resolve_model(options.model),
+        options.conf,
+        tuple(options.classes) if options.classes else None,
+        roi,
+    )
+    result_path = await run_cpu(render_result, image, boxes, roi)
+    # Lưu nguyên bytes upload làm ảnh gốc, không encode lại
+    original_path = await run_in_threadpool(
+        save_bytes, image_bytes, EXTENSIONS[content_type], "original"
+    )
 
     record = DetectionRecord(
         num_detections=len(boxes),
         image_path=original_path,
         result_image_path=result_path,
         original_filename=file.filename or "unknown",
+        source=source,
+        inference_skipped=skipped,
     )
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await db.execute(rollup_upsert(len(boxes), source, skipped=skipped))
+    await db.commit()
+    await db.refresh(record)
 
     return DetailedDetectionResponse(
         id=record.id,
         created_at=record.created_at,
         num_detections=len(boxes),
-        result_image_url=f"/static/results/{Path(result_path).name}",
-        boxes=[
-            BBoxInfo(x1=b.x1, y1=b.y1, x2=b.x2, y2=b.y2, conf=b.conf)
-            for b in boxes
-        ],
+        result_image_url=result_url(result_path),
+        thumbnail_url=thumbnail_url(result_path),
+        boxes=boxes,
     )
 
 
 @router.post("/detect/async", response_model=TaskSubmitResponse)
 async def detect_person_async(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db),
+    source: str | None = Form(None, max_length=100),
+    options: DetectionOptions = Depends(detection_options),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Async detection qua Kafka — trả task_id ngay, worker xử lý sau.
     Client dùng GET /api/tasks/{task_id} để check kết quả.
     """
-    allowed_types = {"image/jpeg", "image/png", "image/webp"}
-    if file.content_type not in allowed_types:
-        raise HTTPException(400, "Only accepted JPEG, PNG, WebP")
-
     # 1. Tạo task_id
     task_id = str(uuid.uuid4())
 
-    # 2. Lưu ảnh gốc ra disk
-    image_bytes = await file.read()
-    upload_dir = settings.UPLOAD_DIR / "uploads"
-    upload_dir.mkdir(parents=True, exist_ok=True)
-    image_path = upload_dir / f"{task_id}.jpg"
-    image_path.write_bytes(image_bytes)
+    # 2. Stream ảnh gốc thẳng ra disk (có giới hạn size + check magic bytes)
+    image_path = await save_upload(file, settings.UPLOAD_DIR / "uploads" / task_id)
 
     # 3. Tạo Task record trong DB (status=processing)
     task = Task(
@@ -102,13 +139,15 @@ async def detect_person_async(
         image_path=str(image_path),
     )
     db.add(task)
-    db.commit()
+    await db.commit()
 
     # 4. Gửi message vào Kafka
     await kafka_producer.send_detection_request(
         task_id=task_id,
         image_path=str(image_path),
         original_filename=file.filename or "unknown",
+        source=source,
+        options=options.model_dump(),
     )
 
     # 5. Trả task_id ngay (~100ms)
@@ -118,17 +157,13 @@ async def detect_person_async(
 @router.get("/tasks/{task_id}", response_model=TaskStatusResponse)
 async def get_task_status(
     task_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """Query trạng thái task async."""
-    task = db.query(Task).filter(Task.id == task_id).first()
+    task = (await db.execute(TASK_BY_ID, {"task_id": task_id})).scalar_one_or_none()
     if not task:
         raise HTTPException(404, f"Task {task_id} not found")
 
-    result_image_url = None
-    if task.result_image_path:
-        result_image_url = f"/static/results/{Path(task.result_image_path).name}"
-
     return TaskStatusResponse(
         task_id=task.id,
         status=task.status,
@@ -136,6 +171,6 @@ async def get_task_status(
         completed_at=task.completed_at,
         original_filename=task.original_filename,
         num_detections=task.num_detections,
-        result_image_url=result_image_url,
+        result_image_url=result_url(task.result_image_path),
         error_message=task.error_message,
     )
\ No newline at end of file
@@ -1,13 +1,13 @@
 import math
-from pathlib import Path
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import desc, func, select
 from datetime import date
 
 from ..database import get_db
 from ..models import DetectionRecord
 from ..schemas import HistoryResponse, DetectionResponse
+from ..storage import result_url, thumbnail_url
 
 router = APIRouter()
 
@@ -21,7 +21,7 @@ async def get_history(
     date_to: date | None = Query(None),
     min_detections: int | None = Query(None),
     max_detections: int | None = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Lấy lịch sử detection với filter và phân trang.
@@ -32,40 +32,41 @@ async def get_history(
     - min/max_detections: lọc theo số người detect được
     """
     # ── Build query ──
-    query = db.query(DetectionRecord)
+    query = select(DetectionRecord)
 
     # Search by filename
     if search:
-        query = query.filter(
+        query = query.where(
             DetectionRecord.original_filename.ilike(f"%{search}%")
         )
 
     # Filter by date range
     if date_from:
-        query = query.filter(DetectionRecord.created_at >= date_from)
+        query = query.where(DetectionRecord.created_at >= date_from)
     if date_to:
         from datetime import datetime
         date_to_end = datetime.combine(date_to, datetime.max.time())
-        query = query.filter(DetectionRecord.created_at <= date_to_end)
+        query = query.where(DetectionRecord.created_at <= date_to_end)
 
     # Filter by detection count
     if min_detections is not None:
-        query = query.filter(DetectionRecord.num_detections >= min_detections)
+        query = query.where(DetectionRecord.num_detections >= min_detections)
     if max_detections is not None:
-        query = query.filter(DetectionRecord.num_detections <= max_detections)
+        query = query.where(DetectionRecord.num_detections <= max_detections)
 
     # ── Count total ──
-    total = query.count()
+    total = await db.scalar(select(func.count()).select_from(query.subquery()))
     total_pages = math.ceil(total / page_size) if total > 0 else 1
 
     # ── Paginate ──
     records = (
-        query
-        .order_by(desc(DetectionRecord.created_at))
-        .offset((page - 1) * page_size)
-        .limit(page_size)
-        .all()
-    )
+        await db.scalars(
+            query
+            .order_by(desc(DetectionRecord.created_at))
+            .offset((page - 1) * page_size)
+            .limit(page_size)
+        )
+    ).all()
 
     # ── Map to response ──
     items = [
@@ -73,7 +74,8 @@ async def get_history(
             id=r.id,
             created_at=r.created_at,
             num_detections=r.num_detections,
-            result_image_url=f"/static/results/{Path(r.result_image_path).name}",
+            result_image_url=result_url(r.result_image_path),
+            thumbnail_url=thumbnail_url(r.result_image_path),
         )
         for r in records
     ]
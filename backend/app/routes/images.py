@@ -0,0 +1,149 @@
+import re
+from pathlib import Path
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..processing import run_cpu
+from ..thumbnails import account, render_thumbnail, thumbnail_path, touch
+
+router = APIRouter()
+
+MEDIA_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".webp": "image/webp",
+}
+CHUNK_SIZE = 64 * 1024
+_DIGEST = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _resolve(rel: str) -> Path:
+    """rel path → file thật bên trong UPLOAD_DIR (chặn path traversal)."""
+    root = settings.UPLOAD_DIR.resolve()
+    path = (root / rel).resolve()
+    if (
+        not path.is_relative_to(root)
+        or path.suffix.lower() not in MEDIA_TYPES
+        or not path.is_file()
+    ):
+        raise HTTPException(404, "Image not found")
+    return path
+
+
+def _etag(path: Path, suffix: str = "") -> str:
+    """File content-hashed dùng luôn hash làm ETag; file cũ (tên phẳng) dùng mtime-size."""
+    if _DIGEST.match(path.stem):
+        tag = path.stem
+    else:
+        st = path.stat()
+        tag = f"{int(st.st_mtime)}-{st.st_size}"
+    return f'"{tag}{suffix}"'
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parse 1 range "bytes=a-b" / "bytes=a-" / "bytes=-n".
+    Trả về None nếu range không thoả mãn được: start vượt EOF, suffix rỗng (→ 416).
+    Raise ValueError nếu header sai cú pháp, last < first hoặc multi-range
+    (→ bỏ qua Range, trả 200 theo RFC 9110).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        raise ValueError(header)
+    first, _, last = spec.strip().partition("-")
+    if not (first or last) or not all(p == "" or p.isdigit() for p in (first, last)):
+        raise ValueError(header)
+
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            raise ValueError(header)
+        if start >= size:
+            return None
+        end = int(last) if last else size - 1
+        return start, min(end, size - 1)
+
+    suffix = int(last)
+    if suffix == 0 or size == 0:
+        return None
+    return max(0, size - suffix), size - 1
+
+
+def _iter_file(path: Path, start: int, end: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _serve(request: Request, path: Path, etag: str) -> Response:
+    """FileResponse + immutable Cache-Control, ETag/304 và Range (206)."""
+    headers = {
+        "Cache-Control": f"public, max-age={settings.IMAGE_CACHE_MAX_AGE}, immutable",
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    media_type = MEDIA_TYPES[path.suffix.lower()]
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (
+        if_none_match.strip() == "*"
+        or etag in (t.strip().removeprefix("W/") for t in if_none_match.split(","))
+    ):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range == etag):
+        size = path.stat().st_size
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return FileResponse(path, media_type=media_type, headers=headers)
+        if byte_range is None:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            _iter_file(path, start, end),
+            status_code=206,
+            media_type=media_type,
+            headers=headers,
+        )
+
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+
+@router.get("/images/{rel:path}")
+async def get_image(
+    rel: str,
+    request: Request,
+    w: int | None = Query(None, description="Thumbnail width (THUMBNAIL_SIZES)"),
+):
+    """
+    Serve ảnh kết quả/ảnh gốc. `?w=` trả thumbnail, generate lần đầu rồi
+    cache trên disk (LRU theo THUMBNAIL_CACHE_BYTES).
+    """
+    path = _resolve(rel)
+    if w is None:
+        return _serve(request, path, _etag(path))
+
+    if w not in settings.THUMBNAIL_SIZES:
+        raise HTTPException(400, f"w must be one of {settings.THUMBNAIL_SIZES}")
+
+    thumb = thumbnail_path(path.relative_to(settings.UPLOAD_DIR.resolve()).as_posix(), w)
+    if thumb.exists():
+        await run_in_threadpool(touch, thumb)
+    else:
+        nbytes = await run_cpu(render_thumbnail, str(path), str(thumb), w)
+        await run_in_threadpool(account, nbytes)
+    return _serve(request, thumb, _etag(path, f"-w{w}"))
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Depends, HTTPException, Path
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..models import CameraSource
+from ..roi import invalidate
+from ..schemas import RoiRequest, RoiResponse
+
+router = APIRouter()
+
+SOURCE_ID = Path(..., max_length=100)
+
+
+@router.get("/sources/{source}/roi", response_model=RoiResponse)
+async def get_roi(source: str = SOURCE_ID, db: AsyncSession = Depends(get_db)):
+    """Lấy ROI hiện tại của source."""
+    row = await db.get(CameraSource, source)
+    if not row:
+        raise HTTPException(404, f"Source {source} not found")
+    return RoiResponse(source=row.id, points=row.roi, updated_at=row.updated_at)
+
+
+@router.put("/sources/{source}/roi", response_model=RoiResponse)
+async def set_roi(
+    body: RoiRequest,
+    source: str = SOURCE_ID,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Đặt ROI cho source (camera cố định). Detect của source này sẽ crop theo
+    ROI và chỉ đếm object có điểm chân nằm trong polygon.
+    """
+    row = await db.get(CameraSource, source)
+    if not row:
+        row = CameraSource(id=source)
+        db.add(row)
+    row.roi = [list(p) for p in body.points]
+    await db.commit()
+    await db.refresh(row)
+    invalidate(source)
+    return RoiResponse(source=row.id, points=row.roi, updated_at=row.updated_at)
+
+
+@router.delete("/sources/{source}/roi", response_model=RoiResponse)
+async def delete_roi(source: str = SOURCE_ID, db: AsyncSession = Depends(get_db)):
+    """Bỏ ROI — source quay lại detect toàn khung hình."""
+    row = await db.get(CameraSource, source)
+    if not row:
+        raise HTTPException(404, f"Source {source} not found")
+    row.roi = None
+    await db.commit()
+    await db.refresh(row)
+    invalidate(source)
+    return RoiResponse(source=row.id, points=None, updated_at=row.updated_at)
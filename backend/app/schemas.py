@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from datetime import datetime, date
 
 
@@ -8,6 +8,7 @@ class DetectionResponse(BaseModel):
     created_at: datetime
     num_detections: int
     result_image_url: str
+    thumbnail_url: str | None = None
 
     model_config = {"from_attributes": True}
 
@@ -42,6 +43,13 @@ class BBoxInfo(BaseModel):
     label: str = "person"
 
 
+class DetectionOptions(BaseModel):
+    """Tuỳ chọn detect theo request: model variant, ngưỡng confidence, class cần đếm."""
+    model: str = "default"
+    conf: float | None = Field(default=None, ge=0, le=1)
+    classes: list[int] | None = None
+
+
 class DetailedDetectionResponse(DetectionResponse):
     """Response mở rộng kèm danh sách bounding boxes."""
     boxes: list[BBoxInfo] = []
@@ -69,4 +77,73 @@ class TaskStatusResponse(BaseModel):
     result_image_url: str | None = None
     error_message: str | None = None
 
-    model_config = {"from_attributes": True}
\ No newline at end of file
+    model_config = {"from_attributes": True}
+
+# ── Analytics Schemas ──
+
+class CountBucket(BaseModel):
+    """Thống kê số người trong 1 khoảng thời gian (giờ/ngày)."""
+    bucket: datetime
+    source: str | None = None
+    frames: int          # số ảnh đã detect
+    total: int           # tổng num_detections
+    avg: float
+    max: int
+    skipped: int = 0     # số ảnh bỏ qua inference (frame không đổi)
+    bypass_ratio: float = 0.0
+
+
+class CountSeriesResponse(BaseModel):
+    """Response cho GET /api/analytics/counts và /api/analytics/top."""
+    interval: str  # hour | day
+    date_from: date  # khoảng ngày thực sự được query (sau khi áp default)
+    date_to: date
+    items: list[CountBucket]
+    truncated: bool = False  # True nếu bị cắt ở MAX_BUCKETS
+
+
+class FrameSkipStats(BaseModel):
+    """Tỷ lệ bỏ qua inference của 1 source."""
+    source: str | None = None
+    frames: int
+    skipped: int
+    bypass_ratio: float
+
+
+class FrameSkipResponse(BaseModel):
+    """Response cho GET /api/analytics/frame-skip."""
+    date_from: date
+    date_to: date
+    frames: int
+    skipped: int
+    bypass_ratio: float
+    sources: list[FrameSkipStats]
+
+
+class PercentileResponse(BaseModel):
+    """Response cho GET /api/analytics/percentiles."""
+    date_from: date
+    date_to: date
+    frames: int
+    percentiles: dict[str, int]  # {"p50": 3, "p90": 8, ...}
+
+
+# ── Source / ROI Schemas ──
+
+class RoiRequest(BaseModel):
+    """Polygon ROI, toạ độ chuẩn hoá theo kích thước ảnh (0–1)."""
+    points: list[tuple[float, float]] = Field(min_length=3, max_length=64)
+
+    @field_validator("points")
+    @classmethod
+    def _check_range(cls, points):
+        if any(not (0 <= x <= 1 and 0 <= y <= 1) for x, y in points):
+            raise ValueError("ROI points must be normalized to [0, 1]")
+        return points
+
+
+class RoiResponse(BaseModel):
+    """Response cho GET/PUT /api/sources/{source}/roi."""
+    source: str
+    points: list[tuple[float, float]] | None = None
+    updated_at: datetime | None = None
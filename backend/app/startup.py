@@ -0,0 +1,87 @@
+import asyncio
+import time
+
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+from .database import async_engine
+from .detector import get_detector
+
+
+class StartupState:
+    """Trạng thái khởi động của process, dùng cho readiness probe."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.warmed_up = False
+        self.warmup_seconds: float | None = None
+        self.last_error: str | None = None
+        # Variant phụ warm-up lỗi — chỉ báo, không chặn readiness
+        self.warnings: list[str] = []
+
+
+state = StartupState()
+
+
+def _warm_up_sync():
+    start = time.monotonic()
+    detector = get_detector()
+    state.warnings = detector.warmup(settings.WARMUP_BATCH_SIZES, settings.WARMUP_RUNS)
+    for warning in state.warnings:
+        print(f"⚠️  Variant warm-up skipped: {warning}")
+    return time.monotonic() - start
+
+
+async def warm_up_detector():
+    """
+    Tạo Triton client + chạy warm-up inference, retry tới khi model mặc định
+    thành công (Triton có thể start chậm hơn API). Readiness chỉ OK sau bước này.
+    """
+    while not state.warmed_up:
+        try:
+            state.warmup_seconds = await run_in_threadpool(_warm_up_sync)
+            state.warmed_up = True
+            state.last_error = None
+            print(f"🔥 Detector warmed up in {state.warmup_seconds:.2f}s")
+        except Exception as e:
+            state.last_error = f"warmup: {e}"
+            print(f"⚠️  Warm-up failed, retry in {settings.WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
+
+def _check_triton() -> list[str]:
+    try:
+        if not get_detector().is_loaded():
+            return ["triton: model not ready"]
+    except Exception as e:
+        return [f"triton: {e}"]
+    return []
+
+
+async def _check_dependencies() -> list[str]:
+    """Ping DB + Triton. Trả về danh sách lỗi (rỗng = OK)."""
+    errors = []
+    try:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        errors.append(f"database: {e}")
+    errors += await run_in_threadpool(_check_triton)
+    return errors
+
+
+async def readiness() -> tuple[bool, dict]:
+    """Ready = đã warm-up xong + DB và Triton model đang sẵn sàng."""
+    errors = []
+    if not state.warmed_up:
+        errors.append(state.last_error or "warming up")
+    else:
+        errors = await _check_dependencies()
+    return not errors, {
+        "status": "ready" if not errors else "not_ready",
+        "uptime_seconds": round(time.monotonic() - state.started_at, 1),
+        "warmup_seconds": state.warmup_seconds,
+        "errors": errors,
+        "warnings": state.warnings,
+    }
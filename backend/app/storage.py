@@ -0,0 +1,197 @@
+import errno
+import hashlib
+import os
+import shutil
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import cv2
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import DetectionRecord, Task
+
+# Key cho pg advisory lock — chỉ 1 process chạy cleanup tại 1 thời điểm
+CLEANUP_LOCK_KEY = 0x0BC0_0029
+CLEANUP_BATCH_SIZE = 500
+
+
+# ── Paths ──
+
+def _sharded_path(digest: str, prefix: str, ext: str) -> Path:
+    """static/results/<prefix>/ab/cd/<digest>.<ext> — tránh 1 thư mục chứa hàng triệu file."""
+    return settings.UPLOAD_DIR / prefix / digest[:2] / digest[2:4] / f"{digest}{ext}"
+
+
+def result_url(path: str | None) -> str | None:
+    """Path trên disk → URL dưới /images (hỗ trợ cả records cũ lưu phẳng)."""
+    if not path:
+        return None
+    try:
+        rel = Path(path).relative_to(settings.UPLOAD_DIR).as_posix()
+    except ValueError:
+        rel = Path(path).name
+    return f"/images/{rel}"
+
+
+def thumbnail_url(path: str | None, width: int | None = None) -> str | None:
+    """URL thumbnail (mặc định size nhỏ nhất trong THUMBNAIL_SIZES)."""
+    url = result_url(path)
+    if url is None:
+        return None
+    return f"{url}?w={width or min(settings.THUMBNAIL_SIZES)}"
+
+
+# ── Write ──
+
+def save_bytes(data: bytes, ext: str, prefix: str) -> str:
+    """
+    Lưu bytes theo content hash. Ảnh trùng nội dung dùng chung 1 file.
+    Ghi atomic (tmp + rename) nên reader không bao giờ thấy file dở.
+    """
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    path = _sharded_path(digest, prefix, ext)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f"{ext}.{uuid.uuid4().hex[:8]}.part")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    return str(path)
+
+
+def encode_image(image: np.ndarray, quality: int | None = None) -> tuple[bytes, str]:
+    """Encode ảnh theo RESULT_IMAGE_FORMAT / RESULT_IMAGE_QUALITY. Trả về (bytes, ext)."""
+    quality = quality or settings.RESULT_IMAGE_QUALITY
+    if settings.RESULT_IMAGE_FORMAT == "webp":
+        ext, params = ".webp", [cv2.IMWRITE_WEBP_QUALITY, quality]
+    else:
+        ext, params = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+    ok, buf = cv2.imencode(ext, image, params)
+    if not ok:
+        raise ValueError(f"Cannot encode image as {ext}")
+    return buf.tobytes(), ext
+
+
+def save_result(image: np.ndarray, prefix: str = "result") -> str:
+    """Encode + lưu ảnh vào static/results/<prefix>/. Trả về path."""
+    data, ext = encode_image(image)
+    return save_bytes(data, ext, prefix)
+
+
+def adopt_upload(upload_path: str, prefix: str = "original") -> str:
+    """
+    Chuyển file upload (async path) vào storage theo content hash bằng rename,
+    không encode lại và không để lại bản copy trong uploads/.
+    uploads/ nằm trên volume khác (EXDEV) thì copy sang tmp + rename rồi xoá bản gốc.
+    """
+    src = Path(upload_path)
+    digest = hashlib.blake2b(src.read_bytes(), digest_size=16).hexdigest()
+    path = _sharded_path(digest, prefix, src.suffix or ".jpg")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.exists():
+        src.unlink(missing_ok=True)
+    else:
+        try:
+            os.replace(src, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            tmp_path = path.with_suffix(f"{path.suffix}.{uuid.uuid4().hex[:8]}.part")
+            shutil.copyfile(src, tmp_path)
+            os.replace(tmp_path, path)
+            src.unlink(missing_ok=True)
+    return str(path)
+
+
+# ── Retention ──
+
+def _delete_unreferenced(db: Session, paths: set[str]) -> int:
+    """Xoá file không còn row nào tham chiếu (file có thể dùng chung do content hash)."""
+    if not paths:
+        return 0
+    still_used = set()
+    for column in (
+        DetectionRecord.image_path,
+        DetectionRecord.result_image_path,
+        Task.image_path,
+        Task.result_image_path,
+    ):
+        still_used.update(
+            p for (p,) in db.query(column).filter(column.in_(list(paths))).distinct()
+        )
+
+    removed = 0
+    for p in paths - still_used:
+        try:
+            Path(p).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def purge_expired(db: Session, retention_days: int | None = None) -> tuple[int, int]:
+    """
+    Xoá DetectionRecord/Task cũ hơn retention_days cùng ảnh của chúng.
+    Rollup analytics được giữ nguyên. Trả về (số rows, số files) đã xoá.
+    Bỏ qua nếu process khác đang chạy cleanup.
+
+    Advisory lock là session-level nên giữ trên 1 connection riêng suốt lần chạy;
+    db commit giữa các batch trả connection về pool, lock/unlock qua db sẽ lệch connection.
+    """
+    days = settings.RESULT_RETENTION_DAYS if retention_days is None else retention_days
+    if days <= 0:
+        return 0, 0
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+
+    with db.get_bind().connect() as lock_conn:
+        locked = lock_conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": CLEANUP_LOCK_KEY}
+        ).scalar()
+        lock_conn.commit()
+        if not locked:
+            return 0, 0
+        try:
+            return _purge_before(db, cutoff)
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": CLEANUP_LOCK_KEY})
+            lock_conn.commit()
+
+
+def _purge_before(db: Session, cutoff: datetime) -> tuple[int, int]:
+    rows = files = 0
+    for model in (DetectionRecord, Task):
+        while True:
+            batch = (
+                db.query(model)
+                .filter(model.created_at < cutoff)
+                .order_by(model.created_at)
+                .limit(CLEANUP_BATCH_SIZE)
+                .all()
+            )
+            if not batch:
+                break
+            paths = {
+                p for r in batch for p in (r.image_path, r.result_image_path) if p
+            }
+            for r in batch:
+                db.delete(r)
+            db.commit()
+            rows += len(batch)
+            files += _delete_unreferenced(db, paths)
+
+    # Upload của task đã bị xoá nhưng file còn sót (crash giữa chừng)
+    upload_dir = settings.UPLOAD_DIR / "uploads"
+    if upload_dir.exists():
+        cutoff_ts = cutoff.timestamp()
+        stale = {
+            str(p) for p in upload_dir.iterdir()
+            if p.is_file() and p.stat().st_mtime < cutoff_ts
+        }
+        files += _delete_unreferenced(db, stale)
+    db.commit()
+
+    return rows, files
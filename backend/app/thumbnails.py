@@ -0,0 +1,85 @@
+import os
+import uuid
+from pathlib import Path
+
+import cv2
+
+from .config import settings
+from .storage import encode_image
+
+# Dung lượng cache ước tính của process này (None = chưa scan)
+_cache_bytes: int | None = None
+
+
+def thumbnail_path(rel: str, width: int) -> Path:
+    """static/thumbnails/<width>/<rel path>.<ext> — ext theo RESULT_IMAGE_FORMAT."""
+    ext = ".webp" if settings.RESULT_IMAGE_FORMAT == "webp" else ".jpg"
+    return settings.THUMBNAIL_DIR / str(width) / Path(rel).with_suffix(ext)
+
+
+def render_thumbnail(src: str, dest: str, width: int) -> int:
+    """
+    Resize ảnh về `width` (giữ tỷ lệ, không phóng to) và lưu atomic.
+    Chạy trong process pool. Trả về số bytes đã ghi.
+    """
+    image = cv2.imread(src, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError(f"Cannot read image: {src}")
+    h, w = image.shape[:2]
+    if w > width:
+        image = cv2.resize(image, (width, round(h * width / w)), interpolation=cv2.INTER_AREA)
+
+    data, _ = encode_image(image, quality=settings.THUMBNAIL_QUALITY)
+    dest_path = Path(dest)
+    dest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_path.with_suffix(f"{dest_path.suffix}.{uuid.uuid4().hex[:8]}.part")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, dest_path)
+    return len(data)
+
+
+def _scan() -> list[tuple[float, int, Path]]:
+    entries = []
+    for root, _, files in os.walk(settings.THUMBNAIL_DIR):
+        for name in files:
+            path = Path(root) / name
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def touch(path: Path):
+    """Đánh dấu thumbnail vừa được dùng (mtime = LRU clock)."""
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+
+def account(nbytes: int):
+    """
+    Cộng dung lượng thumbnail mới; vượt THUMBNAIL_CACHE_BYTES thì evict
+    các file lâu không dùng nhất cho tới khi còn ~90% budget.
+    """
+    global _cache_bytes
+    if _cache_bytes is None:
+        _cache_bytes = sum(size for _, size, _ in _scan())
+    else:
+        _cache_bytes += nbytes
+    budget = settings.THUMBNAIL_CACHE_BYTES
+    if _cache_bytes <= budget:
+        return
+
+    # Scan lại thật vì các worker process khác cũng ghi vào cùng thư mục
+    entries = sorted(_scan(), key=lambda e: e[0])
+    total = sum(size for _, size, _ in entries)
+    target = int(budget * 0.9)
+    for _, size, path in entries:
+        if total <= target:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+    _cache_bytes = total
@@ -0,0 +1,258 @@
+import os
+import struct
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .config import settings
+
+CHUNK_SIZE = 64 * 1024
+# Đủ để chứa header + EXIF thông thường của JPEG
+HEAD_SIZE = 64 * 1024
+# Overhead của multipart (boundary, headers) so với kích thước file
+MULTIPART_OVERHEAD = 16 * 1024
+
+EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp"}
+
+# JPEG SOF markers (trừ DHT=C4, JPG=C8, DAC=CC)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def sniff_image_type(head: bytes) -> str | None:
+    """Xác định định dạng ảnh theo magic bytes, không tin content_type của client."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if len(head) >= 12 and head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _jpeg_size(head: bytes) -> tuple[int, int] | None:
+    i = 2
+    n = len(head)
+    while i + 4 <= n:
+        if head[i] != 0xFF:
+            return None
+        marker = head[i + 1]
+        if marker == 0xFF:  # fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # markers không có length
+            i += 2
+            continue
+        if marker in _JPEG_SOF:
+            if i + 9 > n:
+                return None
+            h, w = struct.unpack(">HH", head[i + 5:i + 9])
+            return w, h
+        (length,) = struct.unpack(">H", head[i + 2:i + 4])
+        i += 2 + length
+    return None
+
+
+def _webp_size(head: bytes) -> tuple[int, int] | None:
+    if len(head) < 30:
+        return None
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        w, h = struct.unpack("<HH", head[26:30])
+        return w & 0x3FFF, h & 0x3FFF
+    if chunk == b"VP8L" and head[20] == 0x2F:
+        (bits,) = struct.unpack("<I", head[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X":
+        w = int.from_bytes(head[24:27], "little") + 1
+        h = int.from_bytes(head[27:30], "little") + 1
+        return w, h
+    return None
+
+
+def probe_dimensions(head: bytes, content_type: str) -> tuple[int, int] | None:
+    """
+    Đọc (width, height) chỉ từ header, không decode ảnh.
+    Trả về None nếu header không nằm trọn trong `head`.
+    """
+    if content_type == "image/png":
+        if len(head) >= 24 and head[12:16] == b"IHDR":
+            return struct.unpack(">II", head[16:24])
+        return None
+    if content_type == "image/jpeg":
+        return _jpeg_size(head)
+    if content_type == "image/webp":
+        return _webp_size(head)
+    return None
+
+
+async def _jpeg_size_stream(file: UploadFile) -> tuple[int, int] | None:
+    """
+    Như _jpeg_size nhưng đi theo chuỗi marker trên file: seek qua payload
+    của từng segment (APPn lớn: XMP extended, ICC, MPF) thay vì đọc vào RAM.
+    Chi phí O(số segment), dừng ở MAX_UPLOAD_SIZE.
+    """
+    pos = 2
+    while pos < settings.MAX_UPLOAD_SIZE:
+        await file.seek(pos)
+        header = await file.read(4)
+        if len(header) < 2 or header[0] != 0xFF:
+            return None
+        marker = header[1]
+        if marker == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # markers không có length
+            pos += 2
+            continue
+        if len(header) < 4:
+            return None
+        if marker in _JPEG_SOF:
+            sof = await file.read(5)
+            if len(sof) < 5:
+                return None
+            h, w = struct.unpack(">HH", sof[1:5])
+            return w, h
+        (length,) = struct.unpack(">H", header[2:4])
+        pos += 2 + length
+    return None
+
+
+async def _read_head(file: UploadFile) -> tuple[bytes, str]:
+    """
+    Đọc phần đầu file, sniff + probe kích thước; raise HTTPException nếu không hợp lệ.
+    JPEG có SOF nằm sau phần đã đọc thì đi tiếp theo chuỗi marker trên file;
+    không xác định được kích thước thì reject, không để lọt tới bước decode.
+    Trả về (head, content_type), file được đặt lại ngay sau head.
+    """
+    head = await file.read(HEAD_SIZE)
+    content_type = sniff_image_type(head)
+    if content_type is None:
+        raise HTTPException(400, "Only accepted JPEG, PNG, WebP")
+
+    size = probe_dimensions(head, content_type)
+    if size is None and content_type == "image/jpeg" and len(head) == HEAD_SIZE:
+        size = await _jpeg_size_stream(file)
+        await file.seek(len(head))
+    if size is None:
+        raise HTTPException(400, "Cannot determine image dimensions")
+
+    w, h = size
+    if w * h > settings.MAX_IMAGE_PIXELS:
+        raise HTTPException(
+            413, f"Image too large: {w}x{h} (max {settings.MAX_IMAGE_PIXELS} pixels)"
+        )
+    return head, content_type
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(413, f"File too large (max {settings.MAX_UPLOAD_SIZE} bytes)")
+
+
+async def read_upload(file: UploadFile) -> tuple[bytes, str]:
+    """
+    Đọc upload theo chunk với giới hạn MAX_UPLOAD_SIZE.
+    Reject trước khi gom bytes vào RAM / decode nếu magic bytes / kích thước ảnh
+    không hợp lệ (body đã được multipart parser spool xong, giới hạn body do
+    UploadLimitMiddleware lo). Trả về (image_bytes, content_type).
+    """
+    head, content_type = await _read_head(file)
+
+    chunks = [head]
+    total = len(head)
+    while chunk := await file.read(CHUNK_SIZE):
+        total += len(chunk)
+        if total > settings.MAX_UPLOAD_SIZE:
+            raise _too_large()
+        chunks.append(chunk)
+    return b"".join(chunks), content_type
+
+
+async def save_upload(file: UploadFile, dest: Path) -> Path:
+    """
+    Ghi upload ra disk theo chunk (không buffer cả file trong RAM).
+    `dest` không cần extension — được thêm theo định dạng thật của ảnh.
+    Trả về path đã lưu.
+    """
+    head, content_type = await _read_head(file)
+
+    path = dest.with_suffix(EXTENSIONS[content_type])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".part")
+    total = len(head)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(head)
+            while chunk := await file.read(CHUNK_SIZE):
+                total += len(chunk)
+                if total > settings.MAX_UPLOAD_SIZE:
+                    raise _too_large()
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    return path
+
+
+class UploadLimitMiddleware:
+    """
+    Giới hạn body của request POST trước khi multipart parser spool file ra disk:
+    - Content-Length vượt giới hạn → 413 ngay từ header.
+    - Không có Content-Length (chunked) hoặc khai sai → đếm bytes trong `receive`,
+      vượt giới hạn thì dừng đọc và trả 413.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.max_body = settings.MAX_UPLOAD_SIZE + MULTIPART_OVERHEAD
+
+    async def _reject(self, send: Send):
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json")],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": b'{"detail":"File too large"}',
+        })
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope["headers"]:
+            if name == b"content-length":
+                if value.isdigit() and int(value) > self.max_body:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body:
+                    # HTTPException được FastAPI raise lại nguyên vẹn khi parse body → 413
+                    raise HTTPException(413, "File too large")
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException:
+            # Raise ngoài tầm ExceptionMiddleware (vd app không phải FastAPI route)
+            if response_started:
+                raise
+            await self._reject(send)
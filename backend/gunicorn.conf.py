@@ -0,0 +1,39 @@
+"""
+Gunicorn config — chạy nhiều uvicorn worker process để tận dụng nhiều CPU core.
+
+Chạy: gunicorn -c gunicorn.conf.py app.main:app
+
+Mỗi worker import app sau khi fork nên có Triton client, Kafka producer,
+DB pool và decode pool riêng. Pool DB mỗi process được chia từ
+DB_MAX_CONNECTIONS theo số worker (xem app/database.py).
+"""
+
+import os
+
+from app.config import settings
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = settings.web_workers
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    """
+    Nếu DB_INIT_ON_STARTUP bật: tạo schema 1 lần ở master,
+    tránh N worker cùng chạy create_all (race DDL).
+    """
+    if settings.DB_INIT_ON_STARTUP:
+        from app.database import engine, init_db
+
+        init_db()
+        # Không để worker kế thừa connection mở từ master
+        engine.dispose()
+        settings.DB_INIT_ON_STARTUP = False
+        server.log.info("Schema ready")
+    server.log.info(
+        "Starting %d workers (DB budget %d connections)",
+        workers, settings.DB_MAX_CONNECTIONS,
+    )
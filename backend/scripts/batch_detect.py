@@ -4,6 +4,7 @@ Batch inference — gửi hàng loạt ảnh tới API.
 Cách dùng:
   python batch_detect.py ./images/              # sync mode
   python batch_detect.py ./images/ --async      # async mode (Kafka)
+  python batch_detect.py ./images/ --model fast --conf 0.4 --classes person,bicycle
 """
 
 import os
@@ -19,23 +20,25 @@ API_BASE = os.getenv("API_URL", "http://localhost:8000")
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 
 
-def detect_sync(image_path: Path) -> dict:
+def detect_sync(image_path: Path, options: dict | None = None) -> dict:
     """POST /api/detect — chờ kết quả."""
     with open(image_path, "rb") as f:
         resp = requests.post(
             f"{API_BASE}/api/detect",
             files={"file": (image_path.name, f, "image/jpeg")},
+            data=options or {},
         )
     resp.raise_for_status()
     return resp.json()
 
 
-def detect_async(image_path: Path) -> dict:
+def detect_async(image_path: Path, options: dict | None = None) -> dict:
     """POST /api/detect/async — trả task_id."""
     with open(image_path, "rb") as f:
         resp = requests.post(
             f"{API_BASE}/api/detect/async",
             files={"file": (image_path.name, f, "image/jpeg")},
+            data=options or {},
         )
     resp.raise_for_status()
     return resp.json()
@@ -60,8 +63,22 @@ def main():
                         help="Dùng async mode (Kafka)")
     parser.add_argument("--workers", type=int, default=4,
                         help="Số thread song song (default: 4)")
+    parser.add_argument("--model", help="Model variant (vd: default, fast)")
+    parser.add_argument("--conf", type=float, help="Ngưỡng confidence")
+    parser.add_argument("--classes", help='Class cần đếm, vd "person,car"')
+    parser.add_argument("--source", help="Source / camera id")
     args = parser.parse_args()
 
+    options = {
+        k: v for k, v in {
+            "model": args.model,
+            "conf": args.conf,
+            "classes": args.classes,
+            "source": args.source,
+        }.items()
+        if v is not None
+    }
+
     folder = Path(args.folder)
     images = [f for f in folder.iterdir()
               if f.is_file() and f.suffix.lower() in IMAGE_EXTENSIONS]
@@ -73,6 +90,8 @@ def main():
     print(f"📂 Tìm thấy {len(images)} ảnh trong {folder}")
     print(f"🔧 Mode: {'Async (Kafka)' if args.use_async else 'Sync'}")
     print(f"🧵 Workers: {args.workers}")
+    if options:
+        print(f"⚙️  Options: {options}")
     print("-" * 50)
 
     start_time = time.time()
@@ -82,7 +101,7 @@ def main():
         # Gửi tất cả async, rồi poll kết quả
         task_ids = []
         for img in images:
-            data = detect_async(img)
+            data = detect_async(img, options)
             task_ids.append((img.name, data["task_id"]))
             print(f"  📤 {img.name} → task_id: {data['task_id']}")
 
@@ -96,7 +115,7 @@ def main():
     else:
         # Gửi song song sync
         def process(img):
-            result = detect_sync(img)
+            result = detect_sync(img, options)
             return img.name, result
 
         with ThreadPoolExecutor(max_workers=args.workers) as pool:
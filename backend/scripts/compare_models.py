@@ -0,0 +1,133 @@
+"""
+So sánh các biến thể model (FP32 / INT8 / FP16) trên 1 thư mục ảnh local:
+latency, throughput và độ lệch số đếm so với model tham chiếu (model đầu tiên).
+
+Mặc định gọi Triton (đúng config instance/thread đang deploy); --local chạy
+file ONNX trong model_repository bằng onnxruntime (cần: pip install onnxruntime).
+
+Cách dùng (trong thư mục backend/):
+  python -m scripts.compare_models ./images/
+  python -m scripts.compare_models ./images/ --models pedestrian_detection pedestrian_detection_int8
+  python -m scripts.compare_models ./images/ --local --threads 4 --concurrency 2 --json report.json
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from app.config import settings
+from app.detector import PersonDetector, model_variants, parse_classes
+from scripts.onnx_local import LocalDetector
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+
+
+def load_images(folder: Path, limit: int) -> list[np.ndarray]:
+    """Decode trước toàn bộ ảnh để thời gian đọc disk không lẫn vào kết quả."""
+    paths = sorted(
+        p for p in folder.iterdir()
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )[:limit]
+    images = [cv2.imread(str(p)) for p in paths]
+    return [img for img in images if img is not None]
+
+
+def benchmark(detector: PersonDetector, model: str, images: list[np.ndarray], args) -> dict:
+    """Chạy tuần tự để đo latency + lấy số đếm, rồi chạy song song để đo throughput."""
+    def detect(image):
+        return detector.detect(image, model, args.conf, args.classes)
+
+    for _ in range(args.warmup):
+        detect(images[0])
+
+    counts, latencies = [], []
+    for image in images:
+        start = time.perf_counter()
+        boxes = detect(image)
+        latencies.append((time.perf_counter() - start) * 1000)
+        counts.append(len(boxes))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(detect, images))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "model": model,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "throughput": round(len(images) / elapsed, 2),
+        "counts": counts,
+    }
+
+
+def count_accuracy(counts: list[int], reference: list[int]) -> dict:
+    """Độ lệch số đếm so với tham chiếu: MAE, % ảnh đếm đúng, lệch tổng (%)."""
+    counts_arr, ref_arr = np.asarray(counts), np.asarray(reference)
+    total_ref = int(ref_arr.sum())
+    return {
+        "count_mae": round(float(np.abs(counts_arr - ref_arr).mean()), 3),
+        "exact_match": round(float((counts_arr == ref_arr).mean()) * 100, 1),
+        "total_diff_pct": round((int(counts_arr.sum()) - total_ref) / total_ref * 100, 2)
+        if total_ref else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh model variants")
+    parser.add_argument("folder", help="Thư mục chứa ảnh")
+    parser.add_argument("--models", nargs="+",
+                        help="Tên model Triton, model đầu là tham chiếu "
+                             "(default: TRITON_MODEL_NAME + MODEL_VARIANTS)")
+    parser.add_argument("--local", action="store_true",
+                        help="Chạy onnxruntime local thay vì Triton")
+    parser.add_argument("--threads", type=int, help="intra_op thread (--local)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Số request song song khi đo throughput (default: 4)")
+    parser.add_argument("--limit", type=int, default=200, help="Số ảnh tối đa (default: 200)")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--conf", type=float, help="Ngưỡng confidence")
+    parser.add_argument("--classes", type=parse_classes, help='Class cần đếm, vd "person,car"')
+    parser.add_argument("--json", type=Path, help="Ghi kết quả ra file JSON")
+    args = parser.parse_args()
+
+    models = args.models or list(
+        dict.fromkeys([settings.TRITON_MODEL_NAME, *model_variants().values()])
+    )
+    images = load_images(Path(args.folder), args.limit)
+    if not images:
+        print(f"Không tìm thấy ảnh trong {args.folder}")
+        sys.exit(1)
+
+    detector = LocalDetector(models, args.threads) if args.local else PersonDetector()
+    print(f"📂 {len(images)} ảnh | {'onnxruntime local' if args.local else settings.TRITON_URL}"
+          f" | concurrency {args.concurrency}")
+    print("-" * 86)
+    print(f"{'model':<36}{'p50 ms':>8}{'p95 ms':>8}{'img/s':>8}{'speedup':>9}"
+          f"{'MAE':>7}{'exact%':>8}{'Δtotal%':>9}")
+
+    results = []
+    for model in models:
+        result = benchmark(detector, model, images, args)
+        reference = results[0] if results else result
+        result.update(count_accuracy(result["counts"], reference["counts"]))
+        result["speedup"] = round(result["throughput"] / reference["throughput"], 2)
+        results.append(result)
+        print(f"{model:<36}{result['p50_ms']:>8}{result['p95_ms']:>8}{result['throughput']:>8}"
+              f"{result['speedup']:>8}x{result['count_mae']:>7}{result['exact_match']:>8}"
+              f"{result['total_diff_pct']:>9}")
+
+    if args.json:
+        report = [{k: v for k, v in r.items() if k != "counts"} for r in results]
+        args.json.write_text(json.dumps({"images": len(images), "results": report}, indent=2))
+        print(f"📝 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
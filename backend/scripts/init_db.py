@@ -0,0 +1,17 @@
+"""
+Tạo/cập nhật schema DB — chạy 1 lần trước khi start API và worker.
+
+Cách dùng (trong thư mục backend/):
+  python -m scripts.init_db
+"""
+
+from app.database import init_db
+
+
+def main():
+    init_db()
+    print("✅ Database schema ready")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Chạy model ONNX trong model_repository bằng onnxruntime local (không qua Triton).
+
+Dùng chung cho scripts.quantize_model (preprocess ảnh calibration) và
+scripts.compare_models (--local). Cần: pip install onnxruntime
+"""
+
+from pathlib import Path
+
+import numpy as np
+
+from app.config import settings
+from app.detector import PersonDetector
+
+MODEL_REPOSITORY = Path(__file__).resolve().parent.parent / "model_repository"
+
+
+def model_file(name: str, repository: Path = MODEL_REPOSITORY) -> Path:
+    """model_repository/<name>/1/model.onnx"""
+    return repository / name / "1" / "model.onnx"
+
+
+def create_session(path: Path, threads: int | None = None):
+    """InferenceSession CPU, thread giống config Triton (intra_op = threads, inter_op = 1)."""
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.inter_op_num_threads = 1
+    if threads:
+        options.intra_op_num_threads = threads
+    return ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+
+
+class LocalDetector(PersonDetector):
+    """
+    PersonDetector với _infer chạy onnxruntime: cùng preprocess/postprocess
+    với production nên số đếm so sánh được trực tiếp với Triton.
+    """
+
+    def __init__(
+        self,
+        models: list[str] | None = None,
+        threads: int | None = None,
+        repository: Path = MODEL_REPOSITORY,
+    ):
+        self.conf = settings.CONFIDENCE_THRESHOLD
+        models = models or []
+        self.model_name = models[0] if models else settings.TRITON_MODEL_NAME
+        self.sessions = {
+            name: create_session(model_file(name, repository), threads) for name in models
+        }
+
+    def _infer(self, blob: np.ndarray, model: str | None = None) -> np.ndarray:
+        session = self.sessions[model or self.model_name]
+        return session.run(["output0"], {"images": blob})[0]
+
+    def is_loaded(self) -> bool:
+        return bool(self.sessions)
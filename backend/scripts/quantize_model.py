@@ -0,0 +1,222 @@
+"""
+Tạo biến thể quantized của model FP32 cho node chỉ có CPU và đăng ký vào model_repository.
+
+  int8          static INT8 (QDQ), calibration bằng ảnh upload đã lưu
+  int8_dynamic  dynamic INT8 (không cần calibration, scale activation tính lúc chạy)
+  fp16          FP16 (input/output giữ FP32 nên detector không phải đổi)
+
+Mỗi biến thể được ghi vào model_repository/<TRITON_MODEL_NAME>_<mode>/1/model.onnx
+kèm config.pbtxt từ model_templates/cpu.pbtxt (KIND_CPU, thread đã chỉnh).
+
+Cách dùng (trong thư mục backend/, cần: pip install onnxruntime onnx onnxconverter-common):
+  python -m scripts.quantize_model int8
+  python -m scripts.quantize_model int8 int8_dynamic fp16 --calib-size 300
+  python -m scripts.quantize_model int8 --instances 2 --threads 4 --exclude "/model\\.23/"
+
+So sánh độ chính xác / tốc độ với FP32: python -m scripts.compare_models
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+from string import Template
+
+import cv2
+
+from app.config import settings
+from scripts.onnx_local import MODEL_REPOSITORY, LocalDetector, model_file
+
+TEMPLATE = Path(__file__).resolve().parent.parent / "model_templates" / "cpu.pbtxt"
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
+MODES = ("int8", "int8_dynamic", "fp16")
+
+
+def calibration_images(dirs: list[Path], size: int, seed: int = 0) -> list[Path]:
+    """Lấy ngẫu nhiên (cố định theo seed) tối đa `size` ảnh từ các thư mục upload."""
+    paths = sorted(
+        p for d in dirs if d.exists()
+        for p in d.rglob("*")
+        if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+    )
+    random.Random(seed).shuffle(paths)
+    return paths[:size]
+
+
+def _calibration_reader(paths: list[Path]):
+    """CalibrationDataReader đọc + letterbox từng ảnh khi cần (không giữ cả set trong RAM)."""
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class UploadCalibrationReader(CalibrationDataReader):
+        def __init__(self):
+            self.detector = LocalDetector()
+            self.paths = iter(paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = cv2.imread(str(path))
+                if image is None:
+                    continue
+                blob, _, _ = self.detector._preprocess(image)
+                return {"images": blob}
+            return None
+
+    return UploadCalibrationReader()
+
+
+def _prepare(src: Path, tmp: Path) -> Path:
+    """Shape inference + optimize trước khi quantize (khuyến nghị của onnxruntime)."""
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    prepared = tmp / "prepared.onnx"
+    quant_pre_process(str(src), str(prepared))
+    return prepared
+
+
+def _excluded_nodes(model_path: Path, pattern: str | None) -> list[str]:
+    """Tên các node khớp regex — giữ FP32 (thường là detection head)."""
+    if not pattern:
+        return []
+    import onnx
+
+    graph = onnx.load(str(model_path), load_external_data=False).graph
+    return [n.name for n in graph.node if re.search(pattern, n.name)]
+
+
+def quantize_int8_static(src: Path, dst: Path, images: list[Path], args):
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = _prepare(src, Path(tmp))
+        quantize_static(
+            str(prepared),
+            str(dst),
+            _calibration_reader(images),
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=args.op_types,
+            per_channel=args.per_channel,
+            reduce_range=args.reduce_range,
+            # U8S8: lựa chọn mặc định nhanh nhất cho x86-64
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            nodes_to_exclude=_excluded_nodes(prepared, args.exclude),
+            calibrate_method={
+                "minmax": CalibrationMethod.MinMax,
+                "entropy": CalibrationMethod.Entropy,
+                "percentile": CalibrationMethod.Percentile,
+            }[args.calibrate],
+        )
+
+
+def quantize_int8_dynamic(src: Path, dst: Path, images: list[Path], args):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    with tempfile.TemporaryDirectory() as tmp:
+        prepared = _prepare(src, Path(tmp))
+        quantize_dynamic(
+            str(prepared),
+            str(dst),
+            op_types_to_quantize=args.op_types,
+            per_channel=args.per_channel,
+            reduce_range=args.reduce_range,
+            # ConvInteger trên CPU chỉ hỗ trợ weight uint8
+            weight_type=QuantType.QUInt8,
+            nodes_to_exclude=_excluded_nodes(prepared, args.exclude),
+        )
+
+
+def convert_fp16(src: Path, dst: Path, images: list[Path], args):
+    import onnx
+    from onnxconverter_common import float16
+
+    model = float16.convert_float_to_float16(
+        onnx.load(str(src)),
+        keep_io_types=True,
+        node_block_list=_excluded_nodes(src, args.exclude),
+    )
+    onnx.save(model, str(dst))
+
+
+CONVERTERS = {
+    "int8": quantize_int8_static,
+    "int8_dynamic": quantize_int8_dynamic,
+    "fp16": convert_fp16,
+}
+
+
+def write_config(name: str, instances: int, threads: int, repository: Path = MODEL_REPOSITORY):
+    """model_repository/<name>/config.pbtxt từ template CPU."""
+    config = Template(TEMPLATE.read_text()).substitute(
+        name=name, instances=instances, threads=threads
+    )
+    (repository / name / "config.pbtxt").write_text(config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quantize model cho CPU inference")
+    parser.add_argument("modes", nargs="+", choices=MODES, help="Biến thể cần tạo")
+    parser.add_argument("--model", default=settings.TRITON_MODEL_NAME,
+                        help="Model FP32 gốc trong model_repository")
+    parser.add_argument("--calib-dir", type=Path, action="append",
+                        help="Thư mục ảnh calibration (mặc định: uploads + original đã lưu)")
+    parser.add_argument("--calib-size", type=int, default=200,
+                        help="Số ảnh calibration (default: 200)")
+    parser.add_argument("--calibrate", choices=("minmax", "entropy", "percentile"),
+                        default="minmax", help="Cách tính range activation (static)")
+    parser.add_argument("--op-types", type=lambda s: s.split(","), default=["Conv", "MatMul"],
+                        help="Op được quantize (default: Conv,MatMul)")
+    parser.add_argument("--exclude", help="Regex tên node giữ nguyên FP32, vd detection head")
+    parser.add_argument("--no-per-channel", dest="per_channel", action="store_false",
+                        help="Tắt per-channel weight quantization")
+    parser.add_argument("--reduce-range", action="store_true",
+                        help="Weight 7-bit cho CPU không có VNNI (tránh saturation)")
+    parser.add_argument("--instances", type=int, default=2,
+                        help="Số model instance trên Triton (default: 2)")
+    parser.add_argument("--threads", type=int,
+                        help="intra_op thread mỗi instance (default: số core / instances)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    src = model_file(args.model)
+    if not src.exists():
+        print(f"Không tìm thấy model FP32: {src}")
+        sys.exit(1)
+
+    threads = args.threads or max(1, (os.cpu_count() or 1) // args.instances)
+
+    images: list[Path] = []
+    if "int8" in args.modes:
+        dirs = args.calib_dir or [settings.UPLOAD_DIR / "uploads", settings.UPLOAD_DIR / "original"]
+        images = calibration_images(dirs, args.calib_size, args.seed)
+        if not images:
+            print(f"Không có ảnh calibration trong {', '.join(map(str, dirs))}")
+            sys.exit(1)
+        print(f"📂 Calibration: {len(images)} ảnh ({args.calibrate})")
+
+    variants = {}
+    for mode in args.modes:
+        name = f"{args.model}_{mode}"
+        dst = model_file(name)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+
+        start = time.time()
+        CONVERTERS[mode](src, dst, images, args)
+        write_config(name, args.instances, threads)
+        variants[mode] = name
+
+        size_mb = dst.stat().st_size / 1e6
+        print(f"✅ {mode}: {dst} ({size_mb:.1f} MB, {time.time() - start:.1f}s)")
+
+    print("-" * 50)
+    print(f"⚙️  CPU config: {args.instances} instance × {threads} thread")
+    print("Thêm vào env của backend/worker để chọn theo request (model=<variant>):")
+    print(f"MODEL_VARIANTS='{json.dumps(variants)}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""
+Tính lại bảng detection_rollups từ toàn bộ detection_records.
+
+Dùng khi bật analytics trên DB đã có data cũ, hoặc khi rollup bị lệch.
+
+Cách dùng (trong thư mục backend/):
+  python -m scripts.rebuild_rollups
+"""
+
+import time
+
+from app.database import SessionLocal, init_db
+from app.rollups import rebuild_rollups
+
+
+def main():
+    init_db()
+    db = SessionLocal()
+    try:
+        start = time.time()
+        rows = rebuild_rollups(db)
+        print(f"✅ Rebuilt {rows} rollup rows in {time.time() - start:.1f}s")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
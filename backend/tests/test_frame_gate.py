@@ -0,0 +1,61 @@
+import cv2
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.frame_gate import FrameGate, detect_with_gate
+from app import frame_gate as frame_gate_module
+
+
+class CountingDetector:
+    def __init__(self):
+        self.calls = 0
+
+    def detect(self, image, model=None, conf=None, classes=None, roi=None):
+        self.calls += 1
+        return []
+
+
+def _scene(seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    noise = rng.integers(0, 255, (1080, 1920, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(noise, (31, 31), 0)
+
+
+def _jitter(image: np.ndarray, seed: int) -> np.ndarray:
+    """Nhiễu sensor + nén JPEG như frame camera thật."""
+    rng = np.random.default_rng(seed)
+    noisy = np.clip(image.astype(np.int16) + rng.normal(0, 4, image.shape), 0, 255)
+    _, buf = cv2.imencode(".jpg", noisy.astype(np.uint8), [cv2.IMWRITE_JPEG_QUALITY, 75])
+    return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    monkeypatch.setattr(settings, "FRAME_SKIP_ENABLED", True)
+    monkeypatch.setattr(frame_gate_module, "frame_gate", FrameGate())
+
+
+def test_unchanged_frame_skips_inference(gate):
+    detector = CountingDetector()
+    scene = _scene()
+
+    _, skipped = detect_with_gate(detector, _jitter(scene, 1), "cam-1")
+    assert not skipped
+    _, skipped = detect_with_gate(detector, _jitter(scene, 2), "cam-1")
+    assert skipped
+    assert detector.calls == 1
+
+
+@pytest.mark.parametrize("size", [(120, 300), (40, 100)])
+def test_person_sized_change_forces_inference(gate, size):
+    detector = CountingDetector()
+    scene = _scene()
+    w, h = size
+    with_person = scene.copy()
+    with_person[500:500 + h, 900:900 + w] = (60, 50, 40)
+
+    detect_with_gate(detector, _jitter(scene, 1), "cam-1")
+    _, skipped = detect_with_gate(detector, _jitter(with_person, 2), "cam-1")
+    assert not skipped
+    assert detector.calls == 2
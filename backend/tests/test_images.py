@@ -0,0 +1,134 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+
+from app.config import settings
+from app.routes import images
+from app.routes.images import _parse_range
+
+SIZE = 100
+DIGEST = "0123456789abcdef0123456789abcdef"
+ETAG = f'"{DIGEST}"'
+
+
+# ── _parse_range ──
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("bytes=0-9", (0, 9)),
+        ("bytes=10-", (10, 99)),
+        ("bytes=90-200", (90, 99)),  # last vượt EOF → cắt về size - 1
+        ("bytes=-10", (90, 99)),
+        ("bytes=-500", (0, 99)),
+        ("bytes=5-5", (5, 5)),
+    ],
+)
+def test_parse_range(header, expected):
+    assert _parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=150-200", "bytes=-0"])
+def test_parse_range_unsatisfiable(header):
+    assert _parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize(
+    "header",
+    ["bytes=9-5", "bytes=0-1,5-9", "items=0-9", "bytes=-", "bytes=a-b", "bytes=--5", "bytes=1-x"],
+)
+def test_parse_range_invalid_is_ignored(header):
+    with pytest.raises(ValueError):
+        _parse_range(header, SIZE)
+
+
+# ── GET /images ──
+
+@pytest.fixture
+def image_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", tmp_path)
+    path = tmp_path / "result" / DIGEST[:2] / DIGEST[2:4] / f"{DIGEST}.jpg"
+    path.parent.mkdir(parents=True)
+    path.write_bytes(bytes(range(SIZE)))
+    app = FastAPI()
+    app.include_router(images.router)
+    return app, path.relative_to(tmp_path).as_posix()
+
+
+def _get(app, rel: str, headers: dict[str, str] | None = None):
+    """GET qua ASGI, trả về (status, headers, body)."""
+    sent = []
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        # Client không disconnect: StreamingResponse chờ ở đây tới khi gửi xong body
+        await asyncio.Event().wait()
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "GET",
+        "path": f"/images/{rel}",
+        "raw_path": f"/images/{rel}".encode(),
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    start = next(m for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body
+
+
+def test_full_response_has_cache_headers(image_app):
+    app, rel = image_app
+    status, headers, body = _get(app, rel)
+    assert status == 200
+    assert headers["etag"] == ETAG
+    assert "immutable" in headers["cache-control"]
+    assert body == bytes(range(SIZE))
+
+
+def test_if_none_match_returns_304(image_app):
+    app, rel = image_app
+    status, headers, body = _get(app, rel, {"If-None-Match": f'W/{ETAG}, "other"'})
+    assert status == 304
+    assert body == b""
+
+
+def test_range_returns_206(image_app):
+    app, rel = image_app
+    status, headers, body = _get(app, rel, {"Range": "bytes=10-19"})
+    assert status == 206
+    assert headers["content-range"] == f"bytes 10-19/{SIZE}"
+    assert body == bytes(range(10, 20))
+
+
+def test_range_past_eof_returns_416(image_app):
+    app, rel = image_app
+    status, headers, _ = _get(app, rel, {"Range": f"bytes={SIZE}-"})
+    assert status == 416
+    assert headers["content-range"] == f"bytes */{SIZE}"
+
+
+def test_invalid_range_is_ignored(image_app):
+    app, rel = image_app
+    status, _, body = _get(app, rel, {"Range": "bytes=9-5"})
+    assert status == 200
+    assert body == bytes(range(SIZE))
+
+
+def test_stale_if_range_returns_full_body(image_app):
+    app, rel = image_app
+    status, _, body = _get(app, rel, {"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert status == 200
+    assert len(body) == SIZE
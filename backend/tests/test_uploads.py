@@ -0,0 +1,192 @@
+import asyncio
+import io
+import struct
+
+import cv2
+import numpy as np
+import pytest
+from fastapi import FastAPI, File, HTTPException, UploadFile
+
+from app.config import settings
+from app.uploads import (
+    UploadLimitMiddleware,
+    probe_dimensions,
+    read_upload,
+    sniff_image_type,
+)
+
+W, H = 200, 100
+
+
+def _image() -> np.ndarray:
+    return np.random.default_rng(0).integers(0, 255, (H, W, 3), dtype=np.uint8)
+
+
+def _encode(ext: str, params: list[int] | None = None) -> bytes:
+    ok, buf = cv2.imencode(ext, _image(), params or [])
+    assert ok
+    return buf.tobytes()
+
+
+def _vp8x(width: int, height: int) -> bytes:
+    """Header WebP extended (VP8X) — cv2 không ghi dạng này nên dựng tay."""
+    chunk = b"VP8X" + struct.pack("<I", 10) + b"\x00" * 4
+    chunk += (width - 1).to_bytes(3, "little") + (height - 1).to_bytes(3, "little")
+    return b"RIFF" + struct.pack("<I", 4 + len(chunk)) + b"WEBP" + chunk
+
+
+def _with_app1_prefix(jpeg: bytes, segments: int) -> bytes:
+    """Chèn `segments` segment APP1 64 KB ngay sau SOI (giống XMP extended / MPF)."""
+    app1 = b"\xff\xe1" + struct.pack(">H", 65535) + b"\x00" * 65533
+    return jpeg[:2] + app1 * segments + jpeg[2:]
+
+
+def _read(data: bytes) -> tuple[bytes, str]:
+    return asyncio.run(read_upload(UploadFile(io.BytesIO(data), filename="a")))
+
+
+# ── Sniff + probe ──
+
+@pytest.mark.parametrize(
+    "data, content_type",
+    [
+        (_encode(".jpg"), "image/jpeg"),
+        (_encode(".jpg", [cv2.IMWRITE_JPEG_PROGRESSIVE, 1]), "image/jpeg"),
+        (_encode(".png"), "image/png"),
+        (_encode(".webp", [cv2.IMWRITE_WEBP_QUALITY, 80]), "image/webp"),  # VP8
+        (_encode(".webp", [cv2.IMWRITE_WEBP_QUALITY, 101]), "image/webp"),  # VP8L
+        (_vp8x(W, H), "image/webp"),
+    ],
+    ids=["jpeg", "jpeg-progressive", "png", "webp-vp8", "webp-vp8l", "webp-vp8x"],
+)
+def test_sniff_and_probe(data, content_type):
+    assert sniff_image_type(data) == content_type
+    assert probe_dimensions(data, content_type) == (W, H)
+
+
+def test_sniff_rejects_non_image():
+    assert sniff_image_type(b"GIF89a" + b"\x00" * 32) is None
+    assert sniff_image_type(b"<html></html>") is None
+    assert sniff_image_type(b"") is None
+
+
+@pytest.mark.parametrize("ext", [".jpg", ".png", ".webp"])
+def test_probe_truncated_header(ext):
+    data = _encode(ext)
+    content_type = sniff_image_type(data)
+    assert probe_dimensions(data[:12], content_type) is None
+
+
+# ── read_upload ──
+
+def test_read_upload_returns_bytes():
+    data = _encode(".png")
+    assert _read(data) == (data, "image/png")
+
+
+def test_read_upload_rejects_non_image():
+    with pytest.raises(HTTPException) as exc:
+        _read(b"not an image at all")
+    assert exc.value.status_code == 400
+
+
+def test_read_upload_rejects_truncated_jpeg():
+    with pytest.raises(HTTPException) as exc:
+        _read(_encode(".jpg")[:100])
+    assert exc.value.status_code == 400
+
+
+def test_read_upload_rejects_too_many_pixels(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_IMAGE_PIXELS", W * H - 1)
+    with pytest.raises(HTTPException) as exc:
+        _read(_encode(".jpg"))
+    assert exc.value.status_code == 413
+
+
+def test_jpeg_with_large_app1_prefix_is_accepted():
+    """SOF nằm sau >1 MB segment APP1 — vẫn probe được, không reject ảnh hợp lệ."""
+    data = _with_app1_prefix(_encode(".jpg"), 20)
+    assert len(data) > 1024 * 1024
+
+    read, content_type = _read(data)
+    assert read == data and content_type == "image/jpeg"
+    assert cv2.imdecode(np.frombuffer(read, np.uint8), cv2.IMREAD_COLOR).shape[:2] == (H, W)
+
+
+def test_jpeg_bomb_behind_app1_is_rejected():
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 17, 8, 30000, 30000, 3) + b"\x00" * 20
+    data = _with_app1_prefix(b"\xff\xd8" + sof, 3)
+    with pytest.raises(HTTPException) as exc:
+        _read(data)
+    assert exc.value.status_code == 413
+
+
+# ── UploadLimitMiddleware ──
+
+def _call(app, body_chunks: list[bytes], headers: list[tuple[bytes, bytes]]) -> int:
+    """Gọi ASGI app với body gửi theo chunk, trả về status code."""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": True} for chunk in body_chunks
+    ] + [{"type": "http.request", "body": b"", "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "http_version": "1.1",
+        "method": "POST",
+        "path": "/upload",
+        "raw_path": b"/upload",
+        "root_path": "",
+        "scheme": "http",
+        "query_string": b"",
+        "headers": headers,
+        "client": ("test", 1),
+        "server": ("test", 80),
+    }
+    asyncio.run(app(scope, receive, send))
+    return next(m["status"] for m in sent if m["type"] == "http.response.start")
+
+
+@pytest.fixture
+def upload_app(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_UPLOAD_SIZE", 100_000)
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        data, _ = await read_upload(file)
+        return {"size": len(data)}
+
+    return UploadLimitMiddleware(app)
+
+
+def _multipart(payload: list[bytes]) -> tuple[list[bytes], list[tuple[bytes, bytes]]]:
+    boundary = "boundary"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; "
+        f"filename=\"a.png\"\r\nContent-Type: image/png\r\n\r\n"
+    ).encode()
+    chunks = [head, *payload, f"\r\n--{boundary}--\r\n".encode()]
+    headers = [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]
+    return chunks, headers
+
+
+def test_middleware_accepts_small_chunked_upload(upload_app):
+    chunks, headers = _multipart([_encode(".png")])
+    assert _call(upload_app, chunks, headers) == 200
+
+
+def test_middleware_rejects_chunked_body_over_cap(upload_app):
+    chunks, headers = _multipart([b"\x00" * 10_000] * 50)
+    assert _call(upload_app, chunks, headers) == 413
+
+
+def test_middleware_rejects_content_length_over_cap(upload_app):
+    headers = [(b"content-length", b"10000000")]
+    assert _call(upload_app, [], headers) == 413
@@ -8,6 +8,7 @@ Chạy: python -m worker
 """
 
 import json
+import time
 import asyncio
 import cv2
 import numpy as np
@@ -18,22 +19,25 @@ from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.database import SessionLocal
-from app.detector import PersonDetector
-from app.visualizer import draw_boxes, save_result
+from app.detector import get_detector, parse_classes, resolve_model
+from app.processing import render_result
+from app.roi import get_roi
+from app.frame_gate import detect_with_gate
+from app.storage import adopt_upload, purge_expired
 from app.models import Task, DetectionRecord
+from app.rollups import update_rollup
 
 
-# Khởi tạo detector (Triton client)
-detector = PersonDetector()
-
-
-async def process_message(data: dict):
-    """Xử lý 1 detection request từ Kafka."""
+def handle_message(data: dict):
+    """Xử lý 1 detection request từ Kafka (sync: psycopg2 + Triton gRPC)."""
     task_id = data["task_id"]
     image_path = data["image_path"]
     original_filename = data.get("original_filename", "unknown")
+    source = data.get("source")
+    options = data.get("options") or {}
 
     db: Session = SessionLocal()
+    original_path = None
     try:
         # 1. Đọc ảnh từ disk
         image = cv2.imread(image_path)
@@ -41,14 +45,23 @@ async def process_message(data: dict):
             raise ValueError(f"Cannot read image: {image_path}")
 
         # 2. Detect qua Triton
-        boxes = detector.detect(image)
-
-        # 3. Visualize
-        annotated = draw_boxes(image, boxes)
+        roi = get_roi(db, source)
+        # Cache miss mở transaction — trả connection về pool trước khi chờ Triton/render
+        db.rollback()
+        boxes, skipped = detect_with_gate(
+            get_detector(),
+            image,
+            source,
+            resolve_model(options.get("model")),
+            options.get("conf"),
+            parse_classes(options.get("classes")),
+            roi,
+        )
 
-        # 4. Lưu ảnh kết quả
-        result_path = save_result(annotated, prefix="result")
-        original_path = save_result(image, prefix="original")
+        # 3+4. Ảnh upload được chuyển sang storage làm ảnh gốc trước, rồi visualize + lưu
+        # ảnh kết quả — adopt lỗi thì không để lại ảnh kết quả mồ côi
+        original_path = adopt_upload(image_path)
+        result_path = render_result(image, boxes, roi)
 
         # 5. Lưu DetectionRecord
         record = DetectionRecord(
@@ -56,9 +69,12 @@ async def process_message(data: dict):
             image_path=original_path,
             result_image_path=result_path,
             original_filename=original_filename,
+            source=source,
+            inference_skipped=skipped,
             task_id=task_id,
         )
         db.add(record)
+        update_rollup(db, len(boxes), source, skipped=skipped)
 
         # 6. Update Task status → completed
         task = db.query(Task).filter(Task.id == task_id).first()
@@ -66,18 +82,23 @@ async def process_message(data: dict):
             task.status = "completed"
             task.completed_at = datetime.utcnow()
             task.num_detections = len(boxes)
+            task.image_path = original_path
             task.result_image_path = result_path
 
         db.commit()
-        print(f"✅ Task {task_id}: {len(boxes)} detections")
+        print(f"✅ Task {task_id}: {len(boxes)} detections{' (skipped inference)' if skipped else ''}")
 
     except Exception as e:
         # Update Task status → failed
+        db.rollback()
         task = db.query(Task).filter(Task.id == task_id).first()
         if task:
             task.status = "failed"
             task.completed_at = datetime.utcnow()
             task.error_message = str(e)[:1000]
+            if original_path:
+                # Ảnh đã chuyển khỏi uploads/ — giữ tham chiếu để retention xoá cùng task
+                task.image_path = original_path
             db.commit()
         print(f"❌ Task {task_id} failed: {e}")
 
@@ -85,6 +106,32 @@ async def process_message(data: dict):
         db.close()
 
 
+async def process_message(data: dict):
+    """Chạy handle_message trong thread để DB/Triton không chặn consumer loop (heartbeat)."""
+    await asyncio.to_thread(handle_message, data)
+
+
+def run_cleanup():
+    """Xoá records + ảnh quá RESULT_RETENTION_DAYS (chạy trong thread riêng)."""
+    db: Session = SessionLocal()
+    try:
+        rows, files = purge_expired(db)
+        if rows or files:
+            print(f"🧹 Cleanup: removed {rows} rows, {files} files")
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Cleanup failed: {e}")
+    finally:
+        db.close()
+
+
+async def cleanup_loop():
+    """Cleanup định kỳ; nhiều worker cùng chạy thì pg advisory lock đảm bảo chỉ 1 cái làm."""
+    while True:
+        await asyncio.to_thread(run_cleanup)
+        await asyncio.sleep(settings.CLEANUP_INTERVAL_MINUTES * 60)
+
+
 async def main():
     """Main consumer loop."""
     print(f"🚀 Worker starting...")
@@ -92,6 +139,19 @@ async def main():
     print(f"   Topic: {settings.KAFKA_TOPIC}")
     print(f"   Triton: {settings.TRITON_URL}")
 
+    # Warm-up trước khi nhận message để message đầu không chịu cold start
+    while True:
+        try:
+            start = time.monotonic()
+            warnings = get_detector().warmup(settings.WARMUP_BATCH_SIZES, settings.WARMUP_RUNS)
+            for warning in warnings:
+                print(f"⚠️  Variant warm-up skipped: {warning}")
+            print(f"🔥 Detector warmed up in {time.monotonic() - start:.2f}s")
+            break
+        except Exception as e:
+            print(f"⚠️  Warm-up failed, retry in {settings.WARMUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(settings.WARMUP_RETRY_SECONDS)
+
     consumer = AIOKafkaConsumer(
         settings.KAFKA_TOPIC,
         bootstrap_servers=settings.KAFKA_BOOTSTRAP_SERVERS,
@@ -103,12 +163,19 @@ async def main():
     await consumer.start()
     print("✅ Worker connected to Kafka, waiting for messages...")
 
+    cleanup_task = None
+    if settings.RESULT_RETENTION_DAYS > 0:
+        print(f"   Retention: {settings.RESULT_RETENTION_DAYS} days")
+        cleanup_task = asyncio.create_task(cleanup_loop())
+
     try:
         async for message in consumer:
             data = message.value
             print(f"📩 Received task: {data['task_id']}")
             await process_message(data)
     finally:
+        if cleanup_task:
+            cleanup_task.cancel()
         await consumer.stop()
 
 
@@ -167,7 +167,8 @@ export default function HistoryPage() {
                                             </td>
                                             <td>
                                                 <img
-                                                    src={getResultImageUrl(item.result_image_url)}
+                                                    src={getResultImageUrl(item.thumbnail_url ?? item.result_image_url)}
+                                                    loading="lazy"
                                                     alt={`Result ${item.id}`}
                                                     className={styles.thumbnail}
                                                     onClick={() => setViewImage(getResultImageUrl(item.result_image_url))}
@@ -6,6 +6,7 @@ export interface DetectionResult {
     created_at: string;
     num_detections: number;
     result_image_url: string;
+    thumbnail_url?: string;
     boxes?: Array<{
         x1: number;
         y1: number;